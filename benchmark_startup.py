@@ -0,0 +1,85 @@
+"""
+==============================================================================
+STARTUP BENCHMARK - HR REWARDS PLATFORM
+==============================================================================
+Measures what a fresh replica pays before it can serve its first page:
+
+  * import  - importing rewardsapp.py (module code only, main() not run)
+  * first run - the first full script run of the landing page (Streamlit's
+    AppTest harness), including opening / seeding the database
+
+Each sample runs in a new interpreter so nothing is already imported or
+cached. Resident memory is the process's peak RSS after the step, and the
+heavy-module columns show whether numpy / pandas / plotly.express were loaded.
+
+Usage: python benchmark_startup.py [--runs N] [--page LABEL]
+==============================================================================
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rewardsapp.py")
+
+# Runs inside the child interpreter; prints one JSON line
+CHILD = r"""
+import json, logging, os, resource, sys, time
+logging.disable(logging.WARNING)
+step, app_path, page = sys.argv[1], sys.argv[2], sys.argv[3]
+start = time.perf_counter()
+if step == "import":
+    sys.path.insert(0, os.path.dirname(app_path))
+    import rewardsapp
+else:
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(app_path, default_timeout=600)
+    at.run()
+    if page:
+        at.sidebar.radio[0].set_value(page).run()
+    if at.exception:
+        raise SystemExit(at.exception[0].value)
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "numpy": "numpy" in sys.modules,
+    "pandas": "pandas" in sys.modules,
+    "plotly_express": "plotly.express" in sys.modules,
+}))
+"""
+
+def run_sample(step: str, page: str, db_path: str) -> dict:
+    """Run one measurement in a fresh interpreter"""
+    env = dict(os.environ, REWARDS_DB_PATH=db_path)
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, step, APP_PATH, page],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[3])
+    parser.add_argument("--runs", type=int, default=5, help="samples per step (default 5)")
+    parser.add_argument("--page", default="", help="sidebar page to open after the landing page")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "rewards.db")
+        run_sample("run", "", db_path)  # seed the database once, outside the samples
+
+        print(f"{'step':<10} {'median s':>9} {'max s':>7} {'peak RSS MB':>12}  numpy  pandas  plotly.express")
+        for step in ("import", "run"):
+            samples = [run_sample(step, args.page, db_path) for _ in range(args.runs)]
+            seconds = [s["seconds"] for s in samples]
+            print(f"{step:<10} {statistics.median(seconds):>9.3f} {max(seconds):>7.3f} "
+                  f"{statistics.median(s['rss_mb'] for s in samples):>12.1f}  "
+                  f"{str(samples[-1]['numpy']):<6} {str(samples[-1]['pandas']):<7} "
+                  f"{samples[-1]['plotly_express']}")
+
+if __name__ == "__main__":
+    main()
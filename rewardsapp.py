@@ -10,14 +10,49 @@ Version: 2.0
 ==============================================================================
 """
 
+from __future__ import annotations  # annotations such as pd.DataFrame must not import pandas
+
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
+import importlib
 from datetime import datetime, timedelta
 import json
-from typing import Dict, List, Tuple, Optional
+import io
+from typing import Callable, Dict, List, Tuple, Optional
 import random
+import os
+import sqlite3
+from contextlib import contextmanager
+from collections import OrderedDict
+import bisect
+import threading
+import uuid
+import time
+import smtplib
+from email.message import EmailMessage
+from concurrent.futures import ThreadPoolExecutor
+
+class LazyModule:
+    """Stand-in for a heavy module, imported on first attribute access
+
+    pandas and numpy cost most of a cold start but are only needed by the
+    pages that draw tables or compute levels in bulk. plotly.graph_objects is
+    already imported by Streamlit itself, so wrapping it saves nothing; it is
+    kept behind the same facade only for uniformity.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+# Charts, tables and array facade - use go / pd / np as if they were the modules
+go = LazyModule("plotly.graph_objects")
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
 
 # ==============================================================================
 # SECTION 1: CONFIGURATION & CONSTANTS
@@ -95,9 +130,117 @@ def load_css():
             border-radius: 12px;
             font-weight: 600;
         }
+        
+        /* Card grids - see CARD_TEMPLATES */
+        .card-grid { display: grid; gap: 16px; margin-bottom: 16px; align-items: start; }
+        .card { border-radius: 16px; padding: 20px; text-align: center; }
+        .card-icon { font-size: 48px; margin-bottom: 12px; }
+        .card-title { font-size: 18px; font-weight: 700; color: white; margin-bottom: 8px; }
+        .card-text { font-size: 13px; color: #94a3b8; margin-bottom: 12px; }
+        .card-meta { font-size: 12px; color: #64748b; }
+        .card-points { font-size: 24px; font-weight: 700; color: #3b82f6; margin-bottom: 8px; }
+        
+        .catalog-card { background: rgba(30, 41, 59, 0.6); backdrop-filter: blur(10px);
+                        border: 2px solid #64748b; min-height: 220px; }
+        .catalog-card.available { border-color: #4ade80; }
+        .catalog-card .card-status { padding: 8px 16px; background: #64748b; border-radius: 8px;
+                                     font-size: 12px; font-weight: 600; color: white; }
+        .catalog-card.available .card-status { background: #4ade80; }
+        
+        .definition-card { background: rgba(30, 41, 59, 0.6); border: 1px solid rgba(148, 163, 184, 0.2); }
+        .definition-card .card-points { font-size: 14px; margin-bottom: 4px; }
+        
+        .badge-card { border: 2px solid #4ade80; background: rgba(74, 222, 128, 0.2); }
+        .badge-card .card-icon { margin-bottom: 8px; }
+        .badge-card .card-title { font-size: 16px; margin-bottom: 0; }
+        .badge-card .card-text { font-size: 12px; margin: 4px 0 0 0; }
+        .badge-card.locked { border-color: #64748b; background: rgba(100, 116, 139, 0.2); opacity: 0.6; }
+        .badge-card.locked .card-icon { filter: grayscale(100%); }
+        .badge-card.locked .card-title { color: #94a3b8; }
+        .badge-card.locked .card-text { color: #64748b; }
+        
+        .podium-card { border-radius: 20px; padding: 30px; margin-top: 40px; color: white;
+                       border: 3px solid #e0e0e0; box-shadow: 0 8px 24px rgba(0,0,0,0.2);
+                       background: linear-gradient(135deg, #c0c0c0 0%, #a8a8a8 100%); }
+        .podium-card .card-icon { font-size: 60px; }
+        .podium-card .card-title { font-size: 20px; font-weight: 800; }
+        .podium-card .card-text { font-size: 14px; color: rgba(255,255,255,0.9); }
+        .podium-card .podium-points { font-size: 32px; font-weight: 800; }
+        .podium-card .podium-unit { font-size: 14px; color: rgba(255,255,255,0.9); }
+        .podium-card .podium-level { display: none; }
+        .podium-card.third { border-color: #d4a574; background: linear-gradient(135deg, #cd7f32 0%, #b87333 100%); }
+        .podium-card.first { border-radius: 24px; padding: 40px; margin-top: 0; color: #1e293b;
+                             border: 4px solid #ffed4e; box-shadow: 0 12px 32px rgba(255, 215, 0, 0.4);
+                             background: linear-gradient(135deg, #ffd700 0%, #ffed4e 100%);
+                             animation: pulse 2s infinite; }
+        .podium-card.first .card-icon { font-size: 80px; margin-bottom: 16px; }
+        .podium-card.first .card-title { font-size: 24px; color: #1e293b; }
+        .podium-card.first .card-text, .podium-card.first .podium-unit { font-size: 16px; color: #64748b;
+                                                                         margin-bottom: 16px; }
+        .podium-card.first .podium-points { font-size: 48px; }
+        .podium-card.first .podium-level { display: inline-block; font-size: 14px; padding: 8px 16px;
+                                           background: rgba(30, 41, 59, 0.1); border-radius: 8px; }
         </style>
     """, unsafe_allow_html=True)
 
+def compile_card_template(template: str):
+    """Minify a card's HTML once and return its formatter (str.format_map)"""
+    return " ".join(template.split()).format_map
+
+# Card templates - compiled at import; fields come from the item dicts
+CARD_TEMPLATES = {
+    "catalog": compile_card_template("""
+        <div class="card catalog-card {state}">
+            <div class="card-icon">{icon}</div>
+            <div class="card-title">{name}</div>
+            <div class="card-text">{description}</div>
+            <div class="card-points">{points:,} pts</div>
+            <div class="card-text">Value: {value}</div>
+            <div class="card-status">{status}</div>
+        </div>
+    """),
+    "redemption_definition": compile_card_template("""
+        <div class="card definition-card">
+            <div class="card-icon">{icon}</div>
+            <div class="card-title">{name}</div>
+            <div class="card-text">{description}</div>
+            <div class="card-points">{points:,} points</div>
+            <div class="card-meta">Value: {value} | {category}</div>
+        </div>
+    """),
+    "badge_definition": compile_card_template("""
+        <div class="card definition-card">
+            <div class="card-icon">{icon}</div>
+            <div class="card-title">{name}</div>
+            <div class="card-text">{criteria}</div>
+            <div class="card-meta">Category: {category} | Threshold: {points_threshold}</div>
+        </div>
+    """),
+    "badge": compile_card_template("""
+        <div class="card badge-card {state}">
+            <div class="card-icon">{icon}</div>
+            <div class="card-title">{name}</div>
+            <div class="card-text">{criteria}</div>
+        </div>
+    """),
+    "podium": compile_card_template("""
+        <div class="card podium-card {place}">
+            <div class="card-icon">{medal}</div>
+            <div class="card-title">{name}</div>
+            <div class="card-text">{subtitle}</div>
+            <div class="podium-points">{period_points:,}</div>
+            <div class="podium-unit">points</div>
+            <div class="podium-level">{level_icon} {level_name} Level</div>
+        </div>
+    """),
+}
+
+def render_card_grid(template: str, items: List[Dict], columns="repeat(3, 1fr)"):
+    """Render a whole grid of cards as a single HTML element"""
+    cards = "".join(CARD_TEMPLATES[template](item) for item in items)
+    st.markdown(f'<div class="card-grid" style="grid-template-columns: {columns};">{cards}</div>',
+                unsafe_allow_html=True)
+
 # Leaderboard Levels Configuration
 LEVELS = [
     {"id": 1, "name": "Bronze", "icon": "🥉", "points_min": 0, "points_max": 499, "color": "#cd7f32"},
@@ -108,6 +251,32 @@ LEVELS = [
     {"id": 6, "name": "Grand Master", "icon": "👑", "points_min": 8000, "points_max": 999999, "color": "#9966cc"}
 ]
 
+# Sorted points_min thresholds for level lookups (LEVELS are ordered by threshold);
+# rebuilt by rebuild_level_thresholds() whenever the Levels editor changes LEVELS
+LEVEL_THRESHOLDS = [level["points_min"] for level in LEVELS]
+
+# Leaderboard pagination - rows per page offered in the ranking tables
+LEADERBOARD_PAGE_SIZES = [25, 50, 100]
+
+# Audit log - entries per keyset page
+AUDIT_PAGE_SIZE = 100
+
+# Exports - file formats offered and rows read from the store per chunk
+EXPORT_FORMATS = ["CSV", "Parquet"]
+EXPORT_CHUNK_ROWS = 10_000
+# Finished exports (files and job entries) are removed after this many hours
+EXPORT_RETENTION_HOURS = 24
+
+# Pending request queue - page sizes, sort orders and age filters (days since submission)
+PENDING_PAGE_SIZES = [10, 25, 50]
+PENDING_SORTS = {
+    "Oldest first": "r.date_submitted, r.id",
+    "Newest first": "r.date_submitted DESC, r.id DESC",
+    "Most points": "r.points_requested DESC, r.id",
+    "Fewest points": "r.points_requested, r.id",
+}
+PENDING_AGE_FILTERS = {"Any age": None, "Older than 3 days": 3, "Older than 7 days": 7, "Older than 30 days": 30}
+
 # Badges Configuration
 BADGES = [
     {"id": 1, "name": "Survey Champion", "icon": "📊", "criteria": "Complete 50 surveys", "points_threshold": 50, "category": "surveys"},
@@ -197,78 +366,785 @@ REDEMPTION_OPTIONS = [
     {"id": 10, "name": "Travel Voucher", "points": 10000, "value": "1000 SAR", "icon": "✈️", "category": "Travel", "description": "Travel booking voucher"}
 ]
 
+# Name -> catalog item lookups; rebuilt by rebuild_catalog_indexes() when an item is edited
+EARN_TYPES_BY_NAME = {et["name"]: et for et in EARN_TYPES}
+REDEMPTION_OPTIONS_BY_NAME = {opt["name"]: opt for opt in REDEMPTION_OPTIONS}
+
 # ==============================================================================
-# SECTION 2: DATA STRUCTURES (In-Memory Database Simulation)
+# SECTION 2: DATA STORE (SQLite-backed persistence)
 # ==============================================================================
 
-# Initialize session state for data persistence
+# Series key for the all-categories rollup in the daily_points prefix-sum table
+ALL_CATEGORIES = "*"
+
+# Database location - override with REWARDS_DB_PATH for other environments
+DB_PATH = os.environ.get(
+    "REWARDS_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "rewards.db")
+)
+
+# Where background export jobs write their files - override with REWARDS_EXPORT_DIR
+EXPORT_DIR = os.environ.get(
+    "REWARDS_EXPORT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "exports")
+)
+
+# Outbound notification delivery - each channel is enabled by its setting:
+#   REWARDS_SMTP_SERVER=host:port, e.g. a local debug server started with
+#     python -m aiosmtpd -n -l localhost:1025
+#   REWARDS_WEBHOOK_FILE=path of a JSON-lines file standing in for a webhook endpoint
+SMTP_SERVER = os.environ.get("REWARDS_SMTP_SERVER")
+SMTP_SENDER = os.environ.get("REWARDS_SMTP_SENDER", "rewards@localhost")
+WEBHOOK_FILE = os.environ.get("REWARDS_WEBHOOK_FILE")
+
+DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    department TEXT NOT NULL,
+    title TEXT,
+    role TEXT NOT NULL DEFAULT 'user',
+    join_date TEXT
+);
+
+CREATE TABLE IF NOT EXISTS points_ledger (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    points INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT NOT NULL,
+    date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    approved_by INTEGER,
+    approved_date TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ledger_user_status ON points_ledger (user_id, status);
+CREATE INDEX IF NOT EXISTS idx_ledger_status_date ON points_ledger (status, date);
+CREATE INDEX IF NOT EXISTS idx_ledger_date ON points_ledger (date);
+
+CREATE TABLE IF NOT EXISTS reward_requests (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    earn_type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    points_requested INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    date_submitted TEXT NOT NULL,
+    status TEXT NOT NULL,
+    justification TEXT,
+    attachment_desc TEXT,
+    approved_by INTEGER,
+    approved_date TEXT,
+    reviewed_by INTEGER,
+    reviewed_date TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_requests_user_status ON reward_requests (user_id, status);
+CREATE INDEX IF NOT EXISTS idx_requests_status_date ON reward_requests (status, date_submitted);
+
+CREATE TABLE IF NOT EXISTS redemption_requests (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    redemption_name TEXT NOT NULL,
+    points_cost INTEGER NOT NULL,
+    date_submitted TEXT NOT NULL,
+    status TEXT NOT NULL,
+    fulfillment_status TEXT,
+    notes TEXT,
+    approved_by INTEGER,
+    approved_date TEXT,
+    reviewed_by INTEGER,
+    reviewed_date TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_redemptions_user_status ON redemption_requests (user_id, status);
+CREATE INDEX IF NOT EXISTS idx_redemptions_status_date ON redemption_requests (status, date_submitted);
+
+CREATE TABLE IF NOT EXISTS user_badges (
+    user_id INTEGER NOT NULL,
+    badge_id INTEGER NOT NULL,
+    earned_date TEXT NOT NULL,
+    PRIMARY KEY (user_id, badge_id)
+);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    message TEXT NOT NULL,
+    date TEXT NOT NULL,
+    read INTEGER NOT NULL DEFAULT 0  -- legacy per-row flag; read state lives in notification_inbox
+);
+DROP INDEX IF EXISTS idx_notifications_user_read;
+CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications (user_id, id);
+
+-- Per-user inbox counters: everything with id > read_upto is unread
+CREATE TABLE IF NOT EXISTS notification_inbox (
+    user_id INTEGER PRIMARY KEY,
+    unread INTEGER NOT NULL DEFAULT 0,
+    read_upto INTEGER NOT NULL DEFAULT 0,
+    last_id INTEGER NOT NULL DEFAULT 0
+);
+
+-- Role broadcasts: stored once, expanded into each member's feed at read time.
+-- seq numbers each role's broadcasts 1, 2, 3...; a member has read up to read_seq.
+CREATE TABLE IF NOT EXISTS role_broadcasts (
+    id INTEGER PRIMARY KEY,
+    role TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    message TEXT NOT NULL,
+    date TEXT NOT NULL,
+    UNIQUE (role, seq)
+);
+CREATE TABLE IF NOT EXISTS role_broadcast_counters (
+    role TEXT PRIMARY KEY,
+    last_seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS broadcast_inbox (
+    user_id INTEGER PRIMARY KEY,
+    read_seq INTEGER NOT NULL DEFAULT 0
+);
+
+-- Outbound delivery queue: one row per notification and channel, addressed to a
+-- user or a role (expanded to its members at send time)
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    channel TEXT NOT NULL,
+    user_id INTEGER,
+    role TEXT,
+    type TEXT NOT NULL,
+    message TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt);
+
+CREATE TABLE IF NOT EXISTS audit_log (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    details TEXT NOT NULL,
+    date TEXT NOT NULL
+);
+-- (filter, date, id) indexes serve the filtered, date-bounded keyset pages newest-first
+DROP INDEX IF EXISTS idx_audit_user;
+DROP INDEX IF EXISTS idx_audit_action;
+DROP INDEX IF EXISTS idx_audit_date;
+CREATE INDEX IF NOT EXISTS idx_audit_date_id ON audit_log (date, id);
+CREATE INDEX IF NOT EXISTS idx_audit_action_date ON audit_log (action, date, id);
+CREATE INDEX IF NOT EXISTS idx_audit_user_date ON audit_log (user_id, date, id);
+
+-- Distinct actions and actors seen in the audit log (filter options), maintained on write
+CREATE TABLE IF NOT EXISTS audit_actions (action TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS audit_users (user_id INTEGER PRIMARY KEY);
+
+-- Derived aggregate maintained on every ledger write / redemption approval
+CREATE TABLE IF NOT EXISTS user_balances (
+    user_id INTEGER PRIMARY KEY,
+    earned INTEGER NOT NULL DEFAULT 0,
+    redeemed INTEGER NOT NULL DEFAULT 0
+);
+
+-- Per-user ledger version, bumped with every change to a user's balance or ledger
+-- (keys the cached dashboard view models)
+CREATE TABLE IF NOT EXISTS ledger_versions (
+    user_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+-- Derived per-user, per-category running totals (breakdowns and badge counts)
+CREATE TABLE IF NOT EXISTS user_category_totals (
+    user_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    points INTEGER NOT NULL DEFAULT 0,
+    activity_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, category)
+) WITHOUT ROWID;
+
+-- Daily buckets with a running (prefix) sum per (user, category), plus a
+-- rollup series per user under category '*':
+-- points in [start, end] = cum_points at end - cum_points before start
+CREATE TABLE IF NOT EXISTS daily_points (
+    user_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    day TEXT NOT NULL,
+    points INTEGER NOT NULL DEFAULT 0,
+    cum_points INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, category, day)
+) WITHOUT ROWID;
+
+-- Duplicate-claim index: one row per (user, category, normalized description,
+-- day) held by approved ledger entries and pending reward requests
+CREATE TABLE IF NOT EXISTS claim_keys (
+    user_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    description_key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    refs INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, category, description_key, day)
+) WITHOUT ROWID;
+
+-- The derived tables above are durable and written in the same transaction
+-- as their sources, so they are the persisted snapshot of aggregate state.
+-- (Earlier versions also kept an unread event log and pickled snapshots.)
+DROP TABLE IF EXISTS events;
+DROP TABLE IF EXISTS snapshots;
+
+-- Snapshot of the in-memory ledger frame (Parquet), as of a points_ledger id watermark
+CREATE TABLE IF NOT EXISTS ledger_snapshots (
+    name TEXT PRIMARY KEY,
+    watermark INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    frame BLOB NOT NULL
+);
+"""
+
+def _dict_row(cursor: sqlite3.Cursor, row: tuple) -> Dict:
+    """Row factory returning plain dicts so callers keep using row["field"]"""
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+class RewardsStore:
+    """Embedded SQLite store behind all rewards tables (WAL mode, indexed)
+
+    One instance is shared by every session of the app process. Each session
+    runs on its own script thread, so all use of the connection - and of the
+    caches and indexes - is serialized by a re-entrant lock; a transaction
+    holds it until commit, so other sessions never read uncommitted rows.
+    """
+
+    TABLES = ("users", "points_ledger", "reward_requests", "redemption_requests",
+              "user_badges", "notifications", "audit_log", "user_balances",
+              "user_category_totals", "daily_points", "claim_keys", "audit_actions",
+              "notification_inbox", "role_broadcasts")
+    CACHE_SIZE = 64
+    MEMO_SIZE = 512
+
+    def __init__(self, path: str):
+        self.path = path
+        # Streamlit reruns the script on different threads, so the connection
+        # must not be pinned to the thread that opened it.
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = _dict_row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(DB_SCHEMA)
+        self.lock = threading.RLock()
+        self._tx_depth = 0
+        self._local_commits = 0
+        self._cache = OrderedDict()
+        self._memo = OrderedDict()
+        self._indexes = {}
+        self._index_tables = {}  # index name -> table it is derived from
+        self._indexes_version = None
+        self._table_writes = {}  # table -> local write count (keys table-scoped caches)
+        self._write_epoch = 0    # bumped by bulk rebuilds and rollbacks
+
+    @contextmanager
+    def transaction(self):
+        """Group writes into one atomic transaction (nested calls join the outer one)"""
+        with self.lock:
+            if self._tx_depth == 0:
+                self.conn.execute("BEGIN IMMEDIATE")
+            self._tx_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._tx_depth -= 1
+                if self._tx_depth == 0:
+                    self.conn.execute("ROLLBACK")
+                    # In-memory indexes may hold updates from the rolled-back writes
+                    self._indexes.clear()
+                    self._write_epoch += 1
+                raise
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self.conn.execute("COMMIT")
+                self._local_commits += 1
+
+    def version(self, tables: Optional[Tuple[str, ...]] = None) -> Tuple:
+        """Data version that changes whenever any connection commits a write
+
+        With `tables`, only this connection's writes to those tables (plus any
+        other connection's commit, or a bulk rebuild) move it.
+        """
+        # PRAGMA data_version only moves for other connections' commits
+        external = self.scalar("PRAGMA data_version")
+        if tables is None:
+            return external, self._local_commits
+        return external, self._write_epoch, tuple(self._table_writes.get(t, 0) for t in tables)
+
+    def cached(self, key, compute, tables: Optional[Tuple[str, ...]] = None):
+        """Return compute(), memoized (LRU) until the next committed write (to `tables`, if given)
+
+        compute() runs outside the store lock so a miss does not stall other
+        sessions. The result is stored only if no write moved the version
+        meanwhile, so a value never outlives the data it was computed from.
+        """
+        with self.lock:
+            version = self.version(tables)
+            hit = self._cache.get(key)
+            if hit is not None and hit[0] == version:
+                self._cache.move_to_end(key)
+                return hit[1]
+        value = compute()
+        with self.lock:
+            if self.version(tables) == version:
+                self._cache[key] = (version, value)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return value
+
+    def memo(self, key, compute):
+        """Return compute(), memoized (LRU) under a key that carries its own data version
+
+        compute() runs outside the store lock, so building a large value (figures,
+        view models) does not block other sessions; its own queries still lock.
+        Two sessions missing the same key may both build it - the first stored wins.
+        """
+        with self.lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        value = compute()
+        with self.lock:
+            value = self._memo.setdefault(key, value)
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.MEMO_SIZE:
+                self._memo.popitem(last=False)
+            return value
+
+    def query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        """Run a SELECT and return all rows as dicts"""
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql: str, params: tuple = ()) -> Optional[Dict]:
+        """Run a SELECT and return the first row (or None)"""
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    def scalar(self, sql: str, params: tuple = ()):
+        """Run a SELECT and return the first column of the first row"""
+        with self.lock:
+            row = self.conn.execute(sql, params).fetchone()
+        return next(iter(row.values())) if row else None
+
+    def insert(self, table: str, row: Dict) -> int:
+        """Insert a row and return its id"""
+        self._check_table(table)
+        columns = ", ".join(row)
+        placeholders = ", ".join("?" for _ in row)
+        with self.transaction():
+            cursor = self.conn.execute(
+                f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", tuple(row.values())
+            )
+        self.invalidate_indexes(table)
+        return cursor.lastrowid
+
+    def update(self, table: str, row_id: int, where: Optional[Dict] = None, **fields) -> bool:
+        """Update columns of a single row by id; with `where`, only if its columns still match
+
+        Returns whether the row was changed, so callers can skip follow-up
+        writes when another session got there first.
+        """
+        self._check_table(table)
+        assignments = ", ".join(f"{col} = ?" for col in fields)
+        conditions = "".join(f" AND {col} = ?" for col in (where or {}))
+        with self.transaction():
+            cursor = self.conn.execute(
+                f"UPDATE {table} SET {assignments} WHERE id = ?{conditions}",
+                (*fields.values(), row_id, *(where or {}).values())
+            )
+            if cursor.rowcount == 0:
+                return False
+        self.invalidate_indexes(table)
+        return True
+
+    def is_empty(self, table: str = "users") -> bool:
+        """True when a table has no rows (by default: the database has not been seeded yet)"""
+        self._check_table(table)
+        return self.query_one(f"SELECT 1 FROM {table} LIMIT 1") is None
+
+    def save_snapshot(self, name: str, watermark: int, frame: pd.DataFrame):
+        """Replace the named frame snapshot (stored as Parquet, never pickled)
+
+        Encoding runs before the lock is taken; only the row write holds it.
+        """
+        buffer = io.BytesIO()
+        try:
+            frame.to_parquet(buffer, index=False)
+        except ImportError:
+            return  # no Parquet engine (pyarrow) installed - the frame is rebuilt on restart
+        with self.transaction():
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ledger_snapshots (name, watermark, created_at, frame) VALUES (?, ?, ?, ?)",
+                (name, watermark, datetime.now().strftime("%Y-%m-%d %H:%M"), buffer.getvalue())
+            )
+
+    def load_snapshot(self, name: str) -> Optional[Tuple[int, pd.DataFrame]]:
+        """Return (watermark, frame) of the named snapshot, or None if missing or unreadable"""
+        row = self.query_one("SELECT watermark, frame FROM ledger_snapshots WHERE name = ?", (name,))
+        if row is None:
+            return None
+        try:
+            return row["watermark"], pd.read_parquet(io.BytesIO(row["frame"]))
+        except Exception:
+            return None  # unreadable, or no Parquet engine - rebuild instead
+
+    def index(self, name: str, build, table: Optional[str] = None):
+        """Return an in-memory index, building it on first use or after outside writes
+
+        Indexes registered with a source table are dropped whenever insert() or
+        update() writes to that table; others must be maintained by their writers.
+        """
+        with self.lock:
+            self._sync_indexes()
+            if name not in self._indexes:
+                self._indexes[name] = build()
+                self._index_tables[name] = table
+            return self._indexes[name]
+
+    def invalidate_indexes(self, table: Optional[str] = None):
+        """Drop the in-memory indexes and table-scoped caches derived from a table (or all, after bulk rebuilds)"""
+        with self.lock:
+            if table is None:
+                self._indexes.clear()
+                self._write_epoch += 1
+                return
+            self._table_writes[table] = self._table_writes.get(table, 0) + 1
+            for name in [name for name, source in self._index_tables.items() if source == table]:
+                self._indexes.pop(name, None)
+
+    def peek_index(self, name: str):
+        """Return an in-memory index only if it is built and current (for write-time upkeep)"""
+        with self.lock:
+            self._sync_indexes()
+            return self._indexes.get(name)
+
+    def _sync_indexes(self):
+        # Indexes are maintained for this connection's writes; another
+        # connection committing means they must be rebuilt from the tables.
+        external = self.scalar("PRAGMA data_version")
+        if external != self._indexes_version:
+            self._indexes.clear()
+            self._indexes_version = external
+
+    def _check_table(self, table: str):
+        if table not in self.TABLES:
+            raise ValueError(f"Unknown table: {table}")
+
+class RankIndex:
+    """Order-statistic index over integer scores (Fenwick tree over score values)
+
+    Ranks run by score descending; ties are broken by user id ascending, so every
+    user has a distinct, stable rank. Rank, percentile, neighbour and gap queries
+    are O(log V) where V is the score range covered by the tree.
+    """
+
+    def __init__(self, scores: Optional[Dict[int, int]] = None):
+        self._scores = {}   # user_id -> score
+        self._buckets = {}  # score -> sorted user ids holding that score
+        for user_id, score in sorted((scores or {}).items()):
+            self._scores[user_id] = score
+            self._buckets.setdefault(score, []).append(user_id)
+        self._rebuild_tree()
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._scores
+
+    def score(self, user_id: int) -> int:
+        return self._scores[user_id]
+
+    def set_score(self, user_id: int, score: int):
+        """Insert a user or move them to a new score"""
+        if user_id in self._scores:
+            self.remove(user_id)
+        self._scores[user_id] = score
+        bucket = self._buckets.setdefault(score, [])
+        bisect.insort(bucket, user_id)
+        if not self._low <= score < self._low + self._size:
+            self._rebuild_tree()
+        else:
+            self._add(score - self._low + 1, 1)
+
+    def add_to_score(self, user_id: int, delta: int):
+        self.set_score(user_id, self._scores.get(user_id, 0) + delta)
+
+    def remove(self, user_id: int):
+        score = self._scores.pop(user_id)
+        bucket = self._buckets[score]
+        del bucket[bisect.bisect_left(bucket, user_id)]
+        if not bucket:
+            del self._buckets[score]
+        self._add(score - self._low + 1, -1)
+
+    def rank(self, user_id: int) -> int:
+        """1-based rank of a user"""
+        score = self._scores[user_id]
+        return self._count_above(score) + bisect.bisect_left(self._buckets[score], user_id) + 1
+
+    def percentile(self, user_id: int) -> float:
+        """Share of the other users ranked below this user (100 = top)"""
+        if len(self._scores) <= 1:
+            return 100.0
+        return (len(self._scores) - self.rank(user_id)) / (len(self._scores) - 1) * 100
+
+    def at_rank(self, rank: int) -> Optional[Tuple[int, int]]:
+        """(user_id, score) holding a 1-based rank, or None when out of range"""
+        if not 1 <= rank <= len(self._scores):
+            return None
+        score = self._kth_smallest(len(self._scores) - rank + 1)
+        user_id = self._buckets[score][rank - self._count_above(score) - 1]
+        return user_id, score
+
+    def neighbours(self, user_id: int) -> Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]:
+        """Entries directly above and below a user"""
+        rank = self.rank(user_id)
+        return self.at_rank(rank - 1), self.at_rank(rank + 1)
+
+    def gap_to_next(self, user_id: int) -> Optional[int]:
+        """Points separating a user from the next rank up (None for #1)"""
+        above = self.at_rank(self.rank(user_id) - 1)
+        return above[1] - self._scores[user_id] if above else None
+
+    def top(self, count: int, start_rank: int = 1) -> List[Tuple[int, int, int]]:
+        """(rank, user_id, score) for `count` entries starting at start_rank"""
+        entries = []
+        first = self.at_rank(start_rank)
+        if first is None:
+            return entries
+        score = first[1]
+        offset = start_rank - self._count_above(score) - 1
+        rank = start_rank
+        while len(entries) < count:
+            for user_id in self._buckets[score][offset:offset + count - len(entries)]:
+                entries.append((rank, user_id, score))
+                rank += 1
+            below = self._prefix(score - self._low)  # users scoring strictly less
+            if below == 0:
+                break
+            score, offset = self._kth_smallest(below), 0
+        return entries
+
+    # Fenwick tree over positions 1..size, position p holding score low + p - 1
+    def _rebuild_tree(self):
+        low = min(self._buckets, default=0)
+        span = max(self._buckets, default=0) - low + 1
+        size = 1
+        while size < span:
+            size *= 2
+        self._low, self._size = low, size
+        self._log = size.bit_length() - 1
+        tree = [0] * (size + 1)
+        for score, bucket in self._buckets.items():
+            tree[score - low + 1] += len(bucket)
+        for pos in range(1, size + 1):
+            parent = pos + (pos & -pos)
+            if parent <= size:
+                tree[parent] += tree[pos]
+        self._tree = tree
+
+    def _add(self, pos: int, delta: int):
+        while pos <= self._size:
+            self._tree[pos] += delta
+            pos += pos & -pos
+
+    def _prefix(self, pos: int) -> int:
+        total = 0
+        pos = min(pos, self._size)
+        while pos > 0:
+            total += self._tree[pos]
+            pos -= pos & -pos
+        return total
+
+    def _count_above(self, score: int) -> int:
+        return len(self._scores) - self._prefix(score - self._low + 1)
+
+    def _kth_smallest(self, k: int) -> int:
+        pos, step = 0, 1 << self._log
+        while step:
+            if pos + step <= self._size and self._tree[pos + step] < k:
+                pos += step
+                k -= self._tree[pos]
+            step //= 2
+        return self._low + pos
+
+class LedgerFrame:
+    """Columnar in-memory mirror of points_ledger for vectorized analytics
+
+    The ledger is append-only, so the mirror only ever pulls rows past its id
+    watermark. Columns are typed for compact storage and fast groupby: integer
+    ids and points, categorical category/status, datetime64 dates.
+    """
+
+    COLUMNS = ("id", "user_id", "points", "category", "status", "date")
+    CHUNK_ROWS = 250_000
+    SNAPSHOT_ROWS = 100_000  # snapshot again once this many rows were appended since the last one
+
+    def __init__(self):
+        self.frame = self._typed(pd.DataFrame({col: [] for col in self.COLUMNS}))
+        self.watermark = 0
+        self.snapshot_watermark = 0
+
+    @classmethod
+    def restore(cls, store: RewardsStore) -> "LedgerFrame":
+        """Start from the last snapshot (if still valid); refresh() then replays newer rows"""
+        mirror = cls()
+        snapshot = store.load_snapshot("ledger_frame")
+        if snapshot is not None:
+            watermark, frame = snapshot
+            newest = store.scalar("SELECT COALESCE(MAX(id), 0) FROM points_ledger")
+            if watermark <= newest and tuple(frame.columns) == cls.COLUMNS:
+                mirror.frame = frame
+                mirror.watermark = mirror.snapshot_watermark = watermark
+        return mirror
+
+    def snapshot_if_due(self, store: RewardsStore):
+        """Persist the mirror in the background when enough rows were appended since the last snapshot"""
+        with store.lock:
+            if self.watermark - self.snapshot_watermark < self.SNAPSHOT_ROWS:
+                return
+            self.snapshot_watermark = self.watermark
+            # _append never changes a frame in place, so this one can be encoded unlocked
+            watermark, frame = self.watermark, self.frame
+        threading.Thread(
+            target=store.save_snapshot, args=("ledger_frame", watermark, frame),
+            name="rewards-snapshot", daemon=True
+        ).start()
+
+    def refresh(self, store: RewardsStore) -> pd.DataFrame:
+        """Append ledger rows written since the last refresh and return the frame"""
+        with store.lock:
+            cursor = store.conn.cursor()
+            cursor.row_factory = None  # plain tuples - far cheaper than dicts per row
+            cursor.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM points_ledger WHERE id > ? ORDER BY id",
+                (self.watermark,)
+            )
+            while True:
+                rows = cursor.fetchmany(self.CHUNK_ROWS)
+                if not rows:
+                    break
+                self._append(self._typed(pd.DataFrame.from_records(rows, columns=self.COLUMNS)))
+            return self.frame
+
+    def _append(self, chunk: pd.DataFrame):
+        # Frames already returned are read by other sessions outside the store
+        # lock, so the category sets are grown on new frames, never in place
+        frame = self.frame
+        for col in ("category", "status"):
+            known = frame[col].cat.categories
+            categories = known.append(chunk[col].cat.categories.difference(known))
+            frame = frame.assign(**{col: frame[col].cat.set_categories(categories)})
+            chunk[col] = chunk[col].cat.set_categories(categories)
+        self.frame = pd.concat([frame, chunk], ignore_index=True) if len(frame) else chunk
+        self.watermark = int(chunk["id"].iloc[-1])
+
+    @staticmethod
+    def _typed(frame: pd.DataFrame) -> pd.DataFrame:
+        return frame.astype({
+            "id": "int64", "user_id": "int32", "points": "int64",
+            "category": "category", "status": "category"
+        }).assign(date=pd.to_datetime(frame["date"], format="ISO8601", errors="coerce"))
+
+def seed_demo_data(store: RewardsStore):
+    """Populate an empty database with the demo organization"""
+    with store.transaction():
+        # Another session may have seeded while we waited for the write lock
+        if not store.is_empty():
+            return
+
+        # Users database
+        for user in [
+            {"id": 1, "name": "Ahmed Al-Saud", "email": "ahmed@alkhorayef.com", "department": "Engineering", "role": "user", "join_date": "2023-01-15"},
+            {"id": 2, "name": "Mahmoud Hamidah", "email": "mahmoud.hamidah@alkhorayef.com", "department": "HR", "role": "admin", "join_date": "2022-06-10"},
+            {"id": 3, "name": "Renier Annandale", "email": "renier@alkhorayef.com", "department": "IT", "title": "Digital Transformation Director", "role": "user", "join_date": "2023-06-20"},
+            {"id": 4, "name": "Sara Al-Mutairi", "email": "sara@alkhorayef.com", "department": "Finance", "role": "user", "join_date": "2022-03-05"},
+            {"id": 5, "name": "Mohammed Al-Qahtani", "email": "mohammed@alkhorayef.com", "department": "Operations", "role": "user", "join_date": "2021-11-12"}
+        ]:
+            store.insert("users", user)
+        # Members start at the current broadcast position; later broadcasts are unread
+        store.conn.execute("INSERT OR IGNORE INTO broadcast_inbox (user_id, read_seq) SELECT id, 0 FROM users")
+
+        # Points ledger (all point transactions)
+        for entry in [
+            {"id": 1, "user_id": 3, "points": 840, "category": "training", "description": "Mandatory training - 42 hours", "date": "2024-11-15", "status": "approved", "approved_by": 2, "approved_date": "2024-11-15"},
+            {"id": 2, "user_id": 3, "points": 480, "category": "training", "description": "Elective training - 24 hours", "date": "2024-11-20", "status": "approved", "approved_by": 2, "approved_date": "2024-11-20"},
+            {"id": 3, "user_id": 3, "points": 500, "category": "certifications", "description": "Azure Fundamentals", "date": "2024-10-05", "status": "approved", "approved_by": 2, "approved_date": "2024-10-05"},
+            {"id": 4, "user_id": 3, "points": 1000, "category": "innovation", "description": "Digital Champion - Idea Accepted", "date": "2024-12-01", "status": "approved", "approved_by": 2, "approved_date": "2024-12-01"},
+            {"id": 5, "user_id": 3, "points": 80, "category": "events", "description": "Corporate Town Hall", "date": "2024-11-25", "status": "approved", "approved_by": 2, "approved_date": "2024-11-25"},
+            {"id": 6, "user_id": 1, "points": 300, "category": "performance", "description": "KPI Target Achieved Q3", "date": "2024-10-01", "status": "approved", "approved_by": 2, "approved_date": "2024-10-01"},
+            {"id": 7, "user_id": 4, "points": 1000, "category": "attendance", "description": "Perfect Attendance Q4", "date": "2024-12-01", "status": "approved", "approved_by": 2, "approved_date": "2024-12-01"}
+        ]:
+            store.insert("points_ledger", entry)
+
+        # Reward requests (pending/approved/rejected point claims)
+        for request in [
+            {"id": 1, "user_id": 3, "earn_type": "Training Course", "category": "training", "points_requested": 200, "description": "Completed Advanced Leadership Training", "date_submitted": "2024-12-08", "status": "pending", "justification": "8-hour leadership course with certificate", "attachment_desc": "Certificate_Leadership.pdf"},
+            {"id": 2, "user_id": 1, "earn_type": "Innovation Idea", "category": "innovation", "points_requested": 60, "description": "Submitted process improvement idea", "date_submitted": "2024-12-09", "status": "pending", "justification": "Idea to streamline approval workflows", "attachment_desc": "Idea_Workflow.docx"}
+        ]:
+            store.insert("reward_requests", request)
+
+        # Redemption requests
+        for redemption in [
+            {"id": 1, "user_id": 3, "redemption_name": "Cash Reward", "points_cost": 1500, "date_submitted": "2024-12-05", "status": "approved", "approved_by": 2, "approved_date": "2024-12-06", "fulfillment_status": "completed"},
+            {"id": 2, "user_id": 4, "redemption_name": "Gym Membership", "points_cost": 3000, "date_submitted": "2024-12-07", "status": "pending", "fulfillment_status": "pending"}
+        ]:
+            store.insert("redemption_requests", redemption)
+
+        # User badges (earned badges)
+        for badge in [
+            {"user_id": 3, "badge_id": 2, "earned_date": "2024-11-20"},
+            {"user_id": 3, "badge_id": 3, "earned_date": "2024-12-01"},
+            {"user_id": 1, "badge_id": 8, "earned_date": "2024-10-01"}
+        ]:
+            store.insert("user_badges", badge)
+
+        # Notifications
+        for notification in [
+            {"id": 1, "user_id": 3, "type": "points_earned", "message": "You earned 200 points for Advanced Leadership Training!", "date": "2024-11-20", "read": False},
+            {"id": 2, "user_id": 3, "type": "level_up", "message": "Congratulations! You've reached Gold level!", "date": "2024-12-01", "read": False},
+            {"id": 3, "user_id": 2, "type": "admin_request", "message": "New reward point request from Ahmed Al-Saud", "date": "2024-12-09", "read": False},
+            {"id": 4, "user_id": 2, "type": "admin_redemption", "message": "New redemption request from Sara Al-Mutairi", "date": "2024-12-07", "read": False}
+        ]:
+            store.insert("notifications", notification)
+
+        # Audit log
+        for entry in [
+            {"id": 1, "user_id": 2, "action": "approved_reward_request", "details": "Approved 840 points for Renier Annandale - Training", "date": "2024-11-15 14:30"},
+            {"id": 2, "user_id": 2, "action": "approved_redemption", "details": "Approved Cash Reward redemption for Renier Annandale", "date": "2024-12-06 10:15"},
+            {"id": 3, "user_id": 3, "action": "submitted_reward_request", "details": "Submitted request for 200 points - Training", "date": "2024-12-08 09:20"},
+            {"id": 4, "user_id": 4, "action": "submitted_redemption", "details": "Requested Gym Membership redemption", "date": "2024-12-07 16:45"}
+        ]:
+            store.insert("audit_log", entry)
+
+@st.cache_resource(show_spinner=False)
+def get_store() -> RewardsStore:
+    """Return the process-wide rewards store, opening (and seeding) the database on first use"""
+    store = RewardsStore(DB_PATH)
+    if store.is_empty():
+        seed_demo_data(store)
+    ensure_user_balances(store)
+    ensure_category_totals(store)
+    ensure_daily_points(store)
+    ensure_claim_keys(store)
+    ensure_audit_facets(store)
+    ensure_notification_inbox(store)
+    return store
+
+# Initialize session state (UI state only - records live in the store)
 if 'initialized' not in st.session_state:
     st.session_state.initialized = True
-    
-    # Users database
-    st.session_state.users = [
-        {"id": 1, "name": "Ahmed Al-Saud", "email": "ahmed@alkhorayef.com", "department": "Engineering", "role": "user", "join_date": "2023-01-15"},
-        {"id": 2, "name": "Mahmoud Hamidah", "email": "mahmoud.hamidah@alkhorayef.com", "department": "HR", "role": "admin", "join_date": "2022-06-10"},
-        {"id": 3, "name": "Renier Annandale", "email": "renier@alkhorayef.com", "department": "IT", "title": "Digital Transformation Director", "role": "user", "join_date": "2023-06-20"},
-        {"id": 4, "name": "Sara Al-Mutairi", "email": "sara@alkhorayef.com", "department": "Finance", "role": "user", "join_date": "2022-03-05"},
-        {"id": 5, "name": "Mohammed Al-Qahtani", "email": "mohammed@alkhorayef.com", "department": "Operations", "role": "user", "join_date": "2021-11-12"}
-    ]
-    
+
     # Current user (for demo purposes - in production, this would be from authentication)
     st.session_state.current_user_id = 3  # Renier
-    
-    # Points ledger (all point transactions)
-    st.session_state.points_ledger = [
-        {"id": 1, "user_id": 3, "points": 840, "category": "training", "description": "Mandatory training - 42 hours", "date": "2024-11-15", "status": "approved", "approved_by": 2, "approved_date": "2024-11-15"},
-        {"id": 2, "user_id": 3, "points": 480, "category": "training", "description": "Elective training - 24 hours", "date": "2024-11-20", "status": "approved", "approved_by": 2, "approved_date": "2024-11-20"},
-        {"id": 3, "user_id": 3, "points": 500, "category": "certifications", "description": "Azure Fundamentals", "date": "2024-10-05", "status": "approved", "approved_by": 2, "approved_date": "2024-10-05"},
-        {"id": 4, "user_id": 3, "points": 1000, "category": "innovation", "description": "Digital Champion - Idea Accepted", "date": "2024-12-01", "status": "approved", "approved_by": 2, "approved_date": "2024-12-01"},
-        {"id": 5, "user_id": 3, "points": 80, "category": "events", "description": "Corporate Town Hall", "date": "2024-11-25", "status": "approved", "approved_by": 2, "approved_date": "2024-11-25"},
-        {"id": 6, "user_id": 1, "points": 300, "category": "performance", "description": "KPI Target Achieved Q3", "date": "2024-10-01", "status": "approved", "approved_by": 2, "approved_date": "2024-10-01"},
-        {"id": 7, "user_id": 4, "points": 1000, "category": "attendance", "description": "Perfect Attendance Q4", "date": "2024-12-01", "status": "approved", "approved_by": 2, "approved_date": "2024-12-01"}
-    ]
-    
-    # Reward requests (pending/approved/rejected point claims)
-    st.session_state.reward_requests = [
-        {"id": 1, "user_id": 3, "earn_type": "Training Course", "category": "training", "points_requested": 200, "description": "Completed Advanced Leadership Training", "date_submitted": "2024-12-08", "status": "pending", "justification": "8-hour leadership course with certificate", "attachment_desc": "Certificate_Leadership.pdf"},
-        {"id": 2, "user_id": 1, "earn_type": "Innovation Idea", "category": "innovation", "points_requested": 60, "description": "Submitted process improvement idea", "date_submitted": "2024-12-09", "status": "pending", "justification": "Idea to streamline approval workflows", "attachment_desc": "Idea_Workflow.docx"}
-    ]
-    
-    # Redemption requests
-    st.session_state.redemption_requests = [
-        {"id": 1, "user_id": 3, "redemption_name": "Cash Reward", "points_cost": 1500, "date_submitted": "2024-12-05", "status": "approved", "approved_by": 2, "approved_date": "2024-12-06", "fulfillment_status": "completed"},
-        {"id": 2, "user_id": 4, "redemption_name": "Gym Membership", "points_cost": 3000, "date_submitted": "2024-12-07", "status": "pending", "fulfillment_status": "pending"}
-    ]
-    
-    # User badges (earned badges)
-    st.session_state.user_badges = [
-        {"user_id": 3, "badge_id": 2, "earned_date": "2024-11-20"},
-        {"user_id": 3, "badge_id": 3, "earned_date": "2024-12-01"},
-        {"user_id": 1, "badge_id": 8, "earned_date": "2024-10-01"}
-    ]
-    
-    # Notifications
-    st.session_state.notifications = [
-        {"id": 1, "user_id": 3, "type": "points_earned", "message": "You earned 200 points for Advanced Leadership Training!", "date": "2024-11-20", "read": False},
-        {"id": 2, "user_id": 3, "type": "level_up", "message": "Congratulations! You've reached Gold level!", "date": "2024-12-01", "read": False},
-        {"id": 3, "user_id": 2, "type": "admin_request", "message": "New reward point request from Ahmed Al-Saud", "date": "2024-12-09", "read": False},
-        {"id": 4, "user_id": 2, "type": "admin_redemption", "message": "New redemption request from Sara Al-Mutairi", "date": "2024-12-07", "read": False}
-    ]
-    
-    # Audit log
-    st.session_state.audit_log = [
-        {"id": 1, "user_id": 2, "action": "approved_reward_request", "details": "Approved 840 points for Renier Annandale - Training", "date": "2024-11-15 14:30"},
-        {"id": 2, "user_id": 2, "action": "approved_redemption", "details": "Approved Cash Reward redemption for Renier Annandale", "date": "2024-12-06 10:15"},
-        {"id": 3, "user_id": 3, "action": "submitted_reward_request", "details": "Submitted request for 200 points - Training", "date": "2024-12-08 09:20"},
-        {"id": 4, "user_id": 4, "action": "submitted_redemption", "details": "Requested Gym Membership redemption", "date": "2024-12-07 16:45"}
-    ]
-    
-    # Next IDs for new records
-    st.session_state.next_points_id = max([p["id"] for p in st.session_state.points_ledger], default=0) + 1
-    st.session_state.next_request_id = max([r["id"] for r in st.session_state.reward_requests], default=0) + 1
-    st.session_state.next_redemption_id = max([r["id"] for r in st.session_state.redemption_requests], default=0) + 1
-    st.session_state.next_notification_id = max([n["id"] for n in st.session_state.notifications], default=0) + 1
-    st.session_state.next_audit_id = max([a["id"] for a in st.session_state.audit_log], default=0) + 1
 
 # ==============================================================================
 # SECTION 3: HELPER FUNCTIONS - SCORING & CALCULATIONS
@@ -314,45 +1190,387 @@ def calculate_points_for_event(event_type: str) -> int:
     key = f"event_{event_type.lower()}"
     return SCORING_RULES.get(key, 50)
 
+def get_user_index() -> Dict[str, Dict]:
+    """Get the user directory: all users plus id, email and name lookups"""
+    def build():
+        users = get_store().query("SELECT * FROM users ORDER BY id")
+        return {
+            "all": users,
+            "by_id": {u["id"]: u for u in users},
+            "by_email": {u["email"].lower(): u for u in users},
+            "by_name": {u["name"]: u for u in users},
+        }
+    return get_store().index("users", build, table="users")
+
+def get_users() -> List[Dict]:
+    """Get all users ordered by id"""
+    return get_user_index()["all"]
+
+def get_user(user_id: int) -> Optional[Dict]:
+    """Get a user by id"""
+    return get_user_index()["by_id"].get(user_id)
+
+def get_user_by_email(email: str) -> Optional[Dict]:
+    """Get a user by email address (case-insensitive)"""
+    return get_user_index()["by_email"].get(email.lower())
+
+def get_user_by_name(name: str) -> Optional[Dict]:
+    """Get a user by display name"""
+    return get_user_index()["by_name"].get(name)
+
+def rebuild_catalog_indexes():
+    """Recompute the name lookups for earn types and redemption options after an edit"""
+    global EARN_TYPES_BY_NAME, REDEMPTION_OPTIONS_BY_NAME
+    EARN_TYPES_BY_NAME = {et["name"]: et for et in EARN_TYPES}
+    REDEMPTION_OPTIONS_BY_NAME = {opt["name"]: opt for opt in REDEMPTION_OPTIONS}
+
 def get_user_total_points(user_id: int) -> int:
     """Get total approved points for a user"""
-    earned = sum(p["points"] for p in st.session_state.points_ledger 
-                 if p["user_id"] == user_id and p["status"] == "approved")
-    redeemed = sum(r["points_cost"] for r in st.session_state.redemption_requests 
-                   if r["user_id"] == user_id and r["status"] == "approved")
-    return earned - redeemed
+    balance = get_store().scalar(
+        "SELECT earned - redeemed FROM user_balances WHERE user_id = ?", (user_id,)
+    )
+    return balance or 0
+
+def get_user_balances(user_ids: Optional[List[int]] = None) -> Dict[int, int]:
+    """Get current point balances for all (or the given) users in a single lookup"""
+    sql = "SELECT user_id, earned - redeemed AS balance FROM user_balances"
+    if user_ids is not None:
+        sql += f" WHERE user_id IN ({', '.join(str(int(uid)) for uid in user_ids)})"
+    return {row["user_id"]: row["balance"] for row in get_store().query(sql)}
+
+def get_earned_totals() -> Dict[int, int]:
+    """Get lifetime approved points earned per user (redemptions not deducted)"""
+    rows = get_store().query("SELECT user_id, earned FROM user_balances WHERE earned != 0")
+    return {row["user_id"]: row["earned"] for row in rows}
+
+def adjust_user_balance(store: RewardsStore, user_id: int, earned: int = 0, redeemed: int = 0):
+    """Apply a delta to a user's maintained balance (call inside the write transaction)"""
+    store.conn.execute(
+        "INSERT INTO user_balances (user_id, earned, redeemed) VALUES (?, ?, ?) "
+        "ON CONFLICT (user_id) DO UPDATE SET earned = earned + excluded.earned, "
+        "redeemed = redeemed + excluded.redeemed",
+        (user_id, earned, redeemed)
+    )
+    store.conn.execute(
+        "INSERT INTO ledger_versions (user_id, version) VALUES (?, 1) "
+        "ON CONFLICT (user_id) DO UPDATE SET version = version + 1",
+        (user_id,)
+    )
+    rank_index = store.peek_index("balance_rank")
+    if rank_index is not None and user_id in rank_index:
+        rank_index.add_to_score(user_id, earned - redeemed)
+
+def bump_all_ledger_versions(store: RewardsStore):
+    """Advance every user's ledger version after a bulk rebuild (call inside the write transaction)"""
+    store.conn.execute(
+        "INSERT INTO ledger_versions (user_id, version) SELECT id, 1 FROM users WHERE true "
+        "ON CONFLICT (user_id) DO UPDATE SET version = version + 1"
+    )
+
+def get_balance_rank_index() -> RankIndex:
+    """Ranking of employees (admins excluded) by current balance, kept in step with writes"""
+    def build():
+        rows = get_store().query(
+            "SELECT u.id, COALESCE(b.earned - b.redeemed, 0) AS balance FROM users u "
+            "LEFT JOIN user_balances b ON b.user_id = u.id WHERE u.role = 'user'"
+        )
+        return RankIndex({row["id"]: row["balance"] for row in rows})
+    return get_store().index("balance_rank", build)
+
+# Balances recomputed from the raw ledger and redemption tables
+BALANCES_FROM_LEDGER_SQL = """
+    SELECT user_id, SUM(earned) AS earned, SUM(redeemed) AS redeemed FROM (
+        SELECT user_id, points AS earned, 0 AS redeemed
+        FROM points_ledger WHERE status = 'approved'
+        UNION ALL
+        SELECT user_id, 0 AS earned, points_cost AS redeemed
+        FROM redemption_requests WHERE status = 'approved'
+    ) GROUP BY user_id
+"""
+
+def verify_user_balances(store: RewardsStore, repair: bool = False) -> List[Dict]:
+    """Compare maintained balances with the raw ledger; optionally rebuild them"""
+    expected = {row["user_id"]: row for row in store.query(BALANCES_FROM_LEDGER_SQL)}
+    actual = {row["user_id"]: row for row in store.query("SELECT * FROM user_balances")}
+    
+    mismatches = []
+    for user_id in sorted(expected.keys() | actual.keys()):
+        exp = expected.get(user_id, {"earned": 0, "redeemed": 0})
+        act = actual.get(user_id, {"earned": 0, "redeemed": 0})
+        if (exp["earned"], exp["redeemed"]) != (act["earned"], act["redeemed"]):
+            mismatches.append({
+                "user_id": user_id,
+                "expected": exp["earned"] - exp["redeemed"],
+                "stored": act["earned"] - act["redeemed"]
+            })
+    
+    if repair and mismatches:
+        with store.transaction():
+            store.conn.execute("DELETE FROM user_balances")
+            store.conn.execute(
+                f"INSERT INTO user_balances (user_id, earned, redeemed) {BALANCES_FROM_LEDGER_SQL}"
+            )
+            bump_all_ledger_versions(store)
+        store.invalidate_indexes()
+    return mismatches
+
+def ensure_user_balances(store: RewardsStore):
+    """Build the balance table from the ledger when it is missing (first open / upgrade)"""
+    if store.is_empty("user_balances"):
+        verify_user_balances(store, repair=True)
 
 def get_user_level(total_points: int) -> Dict:
     """Determine user's level based on total points"""
-    for level in reversed(LEVELS):
-        if total_points >= level["points_min"]:
-            return level
-    return LEVELS[0]
+    return LEVELS[max(bisect.bisect_right(LEVEL_THRESHOLDS, total_points) - 1, 0)]
+
+def get_level_ids(balances) -> np.ndarray:
+    """Determine level ids for a whole array of point balances in one vectorized lookup"""
+    positions = np.searchsorted(LEVEL_THRESHOLDS, np.asarray(balances), side="right") - 1
+    return np.maximum(positions, 0) + 1  # level ids are 1-based positions in LEVELS
+
+def rebuild_level_thresholds():
+    """Recompute the level threshold table after LEVELS has been edited"""
+    global LEVEL_THRESHOLDS
+    LEVEL_THRESHOLDS = [level["points_min"] for level in LEVELS]
 
 def get_points_by_category(user_id: int) -> Dict[str, int]:
     """Get points breakdown by category for a user"""
-    categories = {}
-    for point in st.session_state.points_ledger:
-        if point["user_id"] == user_id and point["status"] == "approved":
-            cat = point["category"]
-            categories[cat] = categories.get(cat, 0) + point["points"]
-    return categories
+    rows = get_store().query(
+        "SELECT category, points FROM user_category_totals WHERE user_id = ?", (user_id,)
+    )
+    return {row["category"]: row["points"] for row in rows}
+
+def get_ledger_version(user_id: int) -> int:
+    """Version of a user's ledger and balance (changes with every write that affects them)"""
+    return get_store().scalar("SELECT version FROM ledger_versions WHERE user_id = ?", (user_id,)) or 0
+
+def get_user_view_model(user_id: int) -> Dict:
+    """Everything the employee dashboard and sidebar show about a user's points, computed once
+
+    Cached per (user_id, ledger version) - and level thresholds - so reruns
+    without a new write to the user's ledger reuse it. The result is shared
+    between sessions - read only.
+    """
+    version = get_ledger_version(user_id)
+    
+    def build():
+        store = get_store()
+        total_points = get_user_total_points(user_id)
+        level = get_user_level(total_points)
+        next_level = LEVELS[level["id"]] if level["id"] < len(LEVELS) else None
+        
+        entries = store.query(
+            "SELECT date, category, description, points, status FROM points_ledger "
+            "WHERE user_id = ? ORDER BY date DESC, id DESC",
+            (user_id,)
+        )
+        history = [
+            {**e, "status": f"✅ {e['status'].upper()}" if e["status"] == "approved" else f"⏳ {e['status'].upper()}"}
+            for e in entries
+        ]
+        return {
+            "total_points": total_points,
+            "level": level,
+            "next_level": next_level,
+            "points_to_next": next_level["points_min"] - total_points if next_level else 0,
+            "points_by_category": get_points_by_category(user_id),
+            "recent_activities": [e for e in entries if e["status"] == "approved"][:10],
+            "history": history,
+            "user_id": user_id,
+            "ledger_version": version,
+        }
+    return get_store().memo(("user_view", user_id, version, tuple(LEVEL_THRESHOLDS)), build)
+
+def get_figure(chart_id: str, scope, version, build) -> go.Figure:
+    """Return a chart built once per (chart id, scope, data version), kept in the store's LRU
+
+    Figures are shared between sessions; st.plotly_chart only reads them.
+    """
+    return get_store().memo(("figure", chart_id, scope, version), build)
+
+def get_activity_counts(user_id: int) -> Dict[str, int]:
+    """Get number of approved activities per category for a user"""
+    rows = get_store().query(
+        "SELECT category, activity_count FROM user_category_totals WHERE user_id = ?", (user_id,)
+    )
+    return {row["category"]: row["activity_count"] for row in rows}
+
+def get_all_points_by_category(user_ids: Optional[List[int]] = None) -> Dict[int, Dict[str, int]]:
+    """Get points breakdown by category for every (or the given) user in a single lookup"""
+    sql = "SELECT user_id, category, points FROM user_category_totals"
+    if user_ids is not None:
+        sql += f" WHERE user_id IN ({', '.join(str(int(uid)) for uid in user_ids)})"
+    breakdown = {}
+    for row in get_store().query(sql):
+        breakdown.setdefault(row["user_id"], {})[row["category"]] = row["points"]
+    return breakdown
+
+# Category totals recomputed from the raw ledger
+CATEGORY_TOTALS_FROM_LEDGER_SQL = """
+    SELECT user_id, category, SUM(points) AS points, COUNT(*) AS activity_count
+    FROM points_ledger WHERE status = 'approved' GROUP BY user_id, category
+"""
+
+def verify_category_totals(store: RewardsStore, repair: bool = False) -> List[Dict]:
+    """Compare maintained category totals with the raw ledger; optionally rebuild them"""
+    def keyed(rows):
+        return {(r["user_id"], r["category"]): (r["points"], r["activity_count"]) for r in rows}
+    
+    expected = keyed(store.query(CATEGORY_TOTALS_FROM_LEDGER_SQL))
+    actual = keyed(store.query("SELECT * FROM user_category_totals"))
+    mismatches = [
+        {"user_id": key[0], "category": key[1],
+         "expected": expected.get(key, (0, 0))[0], "stored": actual.get(key, (0, 0))[0]}
+        for key in sorted(expected.keys() | actual.keys())
+        if expected.get(key, (0, 0)) != actual.get(key, (0, 0))
+    ]
+    
+    if repair and mismatches:
+        with store.transaction():
+            store.conn.execute("DELETE FROM user_category_totals")
+            store.conn.execute(
+                "INSERT INTO user_category_totals (user_id, category, points, activity_count) "
+                f"{CATEGORY_TOTALS_FROM_LEDGER_SQL}"
+            )
+            bump_all_ledger_versions(store)
+        store.invalidate_indexes()
+    return mismatches
+
+def ensure_category_totals(store: RewardsStore):
+    """Build the category totals from the ledger when missing (first open / upgrade)"""
+    if store.is_empty("user_category_totals"):
+        verify_category_totals(store, repair=True)
+
+def add_daily_points(store: RewardsStore, user_id: int, category: str, day: str, points: int):
+    """Add points to a user's day buckets (category and rollup series) and shift later prefix sums"""
+    for series in (category, ALL_CATEGORIES):
+        previous = store.scalar(
+            "SELECT cum_points FROM daily_points WHERE user_id = ? AND category = ? AND day < ? "
+            "ORDER BY day DESC LIMIT 1",
+            (user_id, series, day)
+        ) or 0
+        store.conn.execute(
+            "INSERT INTO daily_points (user_id, category, day, points, cum_points) VALUES (?, ?, ?, 0, ?) "
+            "ON CONFLICT (user_id, category, day) DO NOTHING",
+            (user_id, series, day, previous)
+        )
+        store.conn.execute(
+            "UPDATE daily_points SET points = points + ? WHERE user_id = ? AND category = ? AND day = ?",
+            (points, user_id, series, day)
+        )
+        # Normally the bucket is the user's latest, so this touches a single row
+        store.conn.execute(
+            "UPDATE daily_points SET cum_points = cum_points + ? "
+            "WHERE user_id = ? AND category = ? AND day >= ?",
+            (points, user_id, series, day)
+        )
+
+# Daily buckets of both series (per category and the all-categories rollup) with prefix sums
+DAILY_POINTS_FROM_LEDGER_SQL = f"""
+    SELECT user_id, series AS category, day, points,
+           SUM(points) OVER (PARTITION BY user_id, series ORDER BY day) AS cum_points
+    FROM (SELECT user_id, category AS series, date AS day, SUM(points) AS points
+          FROM points_ledger WHERE status = 'approved' GROUP BY user_id, category, date
+          UNION ALL
+          SELECT user_id, '{ALL_CATEGORIES}', date, SUM(points)
+          FROM points_ledger WHERE status = 'approved' GROUP BY user_id, date)
+"""
+
+def rebuild_daily_points(store: RewardsStore):
+    """Recompute the daily buckets and their prefix sums from the raw ledger"""
+    with store.transaction():
+        store.conn.execute("DELETE FROM daily_points")
+        store.conn.execute(
+            "INSERT INTO daily_points (user_id, category, day, points, cum_points) "
+            f"{DAILY_POINTS_FROM_LEDGER_SQL}"
+        )
+    store.invalidate_indexes()
+
+def verify_daily_points(store: RewardsStore, repair: bool = False) -> List[Dict]:
+    """Compare the maintained daily buckets with the raw ledger; optionally rebuild them"""
+    def keyed(rows):
+        return {(r["user_id"], r["category"], r["day"]): (r["points"], r["cum_points"]) for r in rows}
+    
+    expected = keyed(store.query(DAILY_POINTS_FROM_LEDGER_SQL))
+    actual = keyed(store.query("SELECT * FROM daily_points"))
+    mismatches = [
+        {"user_id": key[0], "category": key[1], "day": key[2],
+         "expected": expected.get(key, (0, 0))[1], "stored": actual.get(key, (0, 0))[1]}
+        for key in sorted(expected.keys() | actual.keys())
+        if expected.get(key, (0, 0)) != actual.get(key, (0, 0))
+    ]
+    
+    if repair and mismatches:
+        rebuild_daily_points(store)
+    return mismatches
+
+def ensure_daily_points(store: RewardsStore):
+    """Build the daily prefix-sum buckets when missing (first open / upgrade)"""
+    if store.is_empty("daily_points"):
+        rebuild_daily_points(store)
+
+# Period points for a (user, series): two prefix-sum lookups
+PREFIX_DIFF_SQL = """
+        COALESCE((SELECT d.cum_points FROM daily_points d
+                  WHERE d.user_id = {user} AND d.category = {series} AND d.day <= :end
+                  ORDER BY d.day DESC LIMIT 1), 0)
+      - COALESCE((SELECT d.cum_points FROM daily_points d
+                  WHERE d.user_id = {user} AND d.category = {series} AND d.day < :start
+                  ORDER BY d.day DESC LIMIT 1), 0)
+"""
+PERIOD_TOTALS_SQL = (
+    "SELECT u.id AS user_id, "
+    + PREFIX_DIFF_SQL.format(user="u.id", series=f"'{ALL_CATEGORIES}'")
+    + " AS points FROM users u"
+)
+PERIOD_CATEGORY_SQL = (
+    "SELECT t.user_id, t.category, "
+    + PREFIX_DIFF_SQL.format(user="t.user_id", series="t.category")
+    + " AS points FROM user_category_totals t"
+)
+
+# Tables whose writes change rankings and analytics - their caches ignore
+# unrelated commits (audit entries, notifications, read markers)
+LEDGER_TABLES = ("points_ledger", "redemption_requests", "users")
+
+def get_period_points(start_date: str, end_date: str) -> Dict[int, int]:
+    """Get approved points per user earned between two dates (inclusive)"""
+    def compute():
+        rows = get_store().query(PERIOD_TOTALS_SQL, {"start": start_date, "end": end_date})
+        return {row["user_id"]: row["points"] for row in rows if row["points"]}
+    return get_store().cached(("period_points", start_date, end_date), compute, LEDGER_TABLES)
+
+def get_period_points_by_category(start_date: str, end_date: str,
+                                  user_ids: Optional[List[int]] = None) -> Dict[int, Dict[str, int]]:
+    """Get approved points per user and category earned between two dates (inclusive)"""
+    sql, params = PERIOD_CATEGORY_SQL, {"start": start_date, "end": end_date}
+    if user_ids is not None:
+        sql += f" WHERE t.user_id IN ({', '.join(str(int(uid)) for uid in user_ids)})"
+    
+    def compute():
+        breakdown = {}
+        for row in get_store().query(sql, params):
+            if row["points"]:
+                breakdown.setdefault(row["user_id"], {})[row["category"]] = row["points"]
+        return breakdown
+    key = ("period_categories", start_date, end_date, tuple(user_ids) if user_ids is not None else None)
+    return get_store().cached(key, compute, LEDGER_TABLES)
 
 def check_and_award_badges(user_id: int):
     """Check if user qualifies for any new badges and award them"""
-    user_points_by_cat = get_points_by_category(user_id)
-    current_badges = [b["badge_id"] for b in st.session_state.user_badges if b["user_id"] == user_id]
+    store = get_store()
+    current_badges = {b["badge_id"] for b in store.query(
+        "SELECT badge_id FROM user_badges WHERE user_id = ?", (user_id,)
+    )}
+    activity_counts = get_activity_counts(user_id)
     
     for badge in BADGES:
         if badge["id"] not in current_badges:
             # Count activities in badge category
-            count = 0
-            for point in st.session_state.points_ledger:
-                if point["user_id"] == user_id and point["category"] == badge["category"]:
-                    count += 1
+            count = activity_counts.get(badge["category"], 0)
             
             if count >= badge["points_threshold"]:
-                st.session_state.user_badges.append({
+                store.insert("user_badges", {
                     "user_id": user_id,
                     "badge_id": badge["id"],
                     "earned_date": datetime.now().strftime("%Y-%m-%d")
@@ -360,81 +1578,796 @@ def check_and_award_badges(user_id: int):
                 # Create notification
                 add_notification(user_id, "badge_earned", f"🎉 You've earned the {badge['name']} badge!")
 
+def normalize_claim_description(description: str) -> str:
+    """Canonical form of a claim description for duplicate detection"""
+    return " ".join(description.lower().split())
+
+def adjust_claim_key(store: RewardsStore, user_id: int, category: str, description: str,
+                     day: str, delta: int):
+    """Add or release a reference to a claim key (call inside the write transaction)"""
+    key = (user_id, category, normalize_claim_description(description), day)
+    store.conn.execute(
+        "INSERT INTO claim_keys (user_id, category, description_key, day, refs) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (user_id, category, description_key, day) DO UPDATE SET refs = refs + excluded.refs",
+        key + (delta,)
+    )
+    store.conn.execute(
+        "DELETE FROM claim_keys WHERE user_id = ? AND category = ? AND description_key = ? AND day = ? "
+        "AND refs <= 0",
+        key
+    )
+
+def expected_claim_keys(store: RewardsStore) -> Dict[Tuple, int]:
+    """Reference counts of every claim key, counted from the ledger and the pending reward requests"""
+    refs = {}
+    claims = store.query(
+        "SELECT user_id, category, description, date AS day FROM points_ledger WHERE status = 'approved' "
+        "UNION ALL SELECT user_id, category, description, date_submitted FROM reward_requests "
+        "WHERE status = 'pending'"
+    )
+    for claim in claims:
+        key = (claim["user_id"], claim["category"], normalize_claim_description(claim["description"]), claim["day"])
+        refs[key] = refs.get(key, 0) + 1
+    return refs
+
+def rebuild_claim_keys(store: RewardsStore):
+    """Recompute the claim keys from the ledger and the pending reward requests"""
+    refs = expected_claim_keys(store)
+    with store.transaction():
+        store.conn.execute("DELETE FROM claim_keys")
+        store.conn.executemany(
+            "INSERT INTO claim_keys (user_id, category, description_key, day, refs) VALUES (?, ?, ?, ?, ?)",
+            [key + (count,) for key, count in refs.items()]
+        )
+
+def verify_claim_keys(store: RewardsStore, repair: bool = False) -> List[Dict]:
+    """Compare the maintained claim keys with the ledger and pending queue; optionally rebuild them"""
+    expected = expected_claim_keys(store)
+    actual = {
+        (r["user_id"], r["category"], r["description_key"], r["day"]): r["refs"]
+        for r in store.query("SELECT * FROM claim_keys")
+    }
+    mismatches = [
+        {"user_id": key[0], "category": key[1], "day": key[3], "claim": key[2],
+         "expected": expected.get(key, 0), "stored": actual.get(key, 0)}
+        for key in sorted(expected.keys() | actual.keys())
+        if expected.get(key, 0) != actual.get(key, 0)
+    ]
+    
+    if repair and mismatches:
+        rebuild_claim_keys(store)
+    return mismatches
+
+def ensure_claim_keys(store: RewardsStore):
+    """Build the claim keys when missing (first open / upgrade)"""
+    if store.is_empty("claim_keys"):
+        rebuild_claim_keys(store)
+
 def check_duplicate_claim(user_id: int, category: str, description: str, date: str) -> bool:
-    """Check if a similar claim already exists (anti-abuse)"""
-    for point in st.session_state.points_ledger:
-        if (point["user_id"] == user_id and 
-            point["category"] == category and 
-            point["description"] == description and 
-            point["date"] == date):
-            return True
-    return False
+    """Check if a similar claim already exists in the ledger or the pending queue (anti-abuse)"""
+    return get_store().query_one(
+        "SELECT 1 FROM claim_keys WHERE user_id = ? AND category = ? AND description_key = ? AND day = ?",
+        (user_id, category, normalize_claim_description(description), date)
+    ) is not None
+
+def add_points_entry(user_id: int, points: int, category: str, description: str,
+                     date: str, approved_by: int) -> int:
+    """Append an approved entry to the points ledger and return its id"""
+    store = get_store()
+    with store.transaction():
+        entry_id = store.insert("points_ledger", {
+            "user_id": user_id,
+            "points": points,
+            "category": category,
+            "description": description,
+            "date": date,
+            "status": "approved",
+            "approved_by": approved_by,
+            "approved_date": datetime.now().strftime("%Y-%m-%d")
+        })
+        adjust_user_balance(store, user_id, earned=points)
+        adjust_claim_key(store, user_id, category, description, date, 1)
+        store.conn.execute(
+            "INSERT INTO user_category_totals (user_id, category, points, activity_count) "
+            "VALUES (?, ?, ?, 1) ON CONFLICT (user_id, category) DO UPDATE SET "
+            "points = points + excluded.points, activity_count = activity_count + 1",
+            (user_id, category, points)
+        )
+        add_daily_points(store, user_id, category, date, points)
+    return entry_id
+
+def approve_redemption(redemption: Dict, approved_by: int) -> bool:
+    """Mark a redemption approved and deduct its cost from the user's balance
+
+    Returns False (and changes nothing) when the redemption is no longer
+    pending or the user can no longer afford it.
+    """
+    store = get_store()
+    with store.transaction():
+        # Re-checked inside the transaction: other sessions may have acted since the page was drawn
+        if get_user_total_points(redemption["user_id"]) < redemption["points_cost"]:
+            return False
+        if not store.update(
+            "redemption_requests", redemption["id"],
+            where={"status": "pending"},
+            status="approved",
+            approved_by=approved_by,
+            approved_date=datetime.now().strftime("%Y-%m-%d"),
+            fulfillment_status="processing"
+        ):
+            return False
+        adjust_user_balance(store, redemption["user_id"], redeemed=redemption["points_cost"])
+    return True
 
 def add_notification(user_id: int, notif_type: str, message: str):
     """Add a notification for a user"""
-    st.session_state.notifications.append({
-        "id": st.session_state.next_notification_id,
-        "user_id": user_id,
-        "type": notif_type,
-        "message": message,
-        "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "read": False
-    })
-    st.session_state.next_notification_id += 1
+    store = get_store()
+    with store.transaction():
+        notif_id = store.insert("notifications", {
+            "user_id": user_id,
+            "type": notif_type,
+            "message": message,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M")
+        })
+        store.conn.execute(
+            "INSERT INTO notification_inbox (user_id, unread, last_id) VALUES (?, 1, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET unread = unread + 1, last_id = excluded.last_id",
+            (user_id, notif_id)
+        )
+        enqueue_delivery(store, notif_type, message, user_id=user_id)
+
+def add_role_notification(role: str, notif_type: str, message: str):
+    """Notify every user with a role through one broadcast row (expanded when members read it)"""
+    store = get_store()
+    with store.transaction():
+        store.conn.execute(
+            "INSERT INTO role_broadcast_counters (role, last_seq) VALUES (?, 1) "
+            "ON CONFLICT (role) DO UPDATE SET last_seq = last_seq + 1",
+            (role,)
+        )
+        seq = store.scalar("SELECT last_seq FROM role_broadcast_counters WHERE role = ?", (role,))
+        store.insert("role_broadcasts", {
+            "role": role,
+            "seq": seq,
+            "type": notif_type,
+            "message": message,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M")
+        })
+        enqueue_delivery(store, notif_type, message, role=role)
+
+def get_inbox(user_id: int) -> Dict:
+    """Get a user's inbox counters: personal unread/watermark plus role broadcast position"""
+    store = get_store()
+    role = get_user(user_id)["role"]
+    inbox = store.query_one(
+        "SELECT unread, read_upto, last_id FROM notification_inbox WHERE user_id = ?", (user_id,)
+    ) or {"unread": 0, "read_upto": 0, "last_id": 0}
+    inbox["role"] = role
+    open_broadcast_inbox(store, user_id, role)
+    inbox["broadcast_last_seq"] = store.scalar(
+        "SELECT last_seq FROM role_broadcast_counters WHERE role = ?", (role,)
+    ) or 0
+    inbox["broadcast_read_seq"] = store.scalar(
+        "SELECT read_seq FROM broadcast_inbox WHERE user_id = ?", (user_id,)
+    ) or 0
+    inbox["total_unread"] = inbox["unread"] + inbox["broadcast_last_seq"] - inbox["broadcast_read_seq"]
+    return inbox
+
+def open_broadcast_inbox(store: RewardsStore, user_id: int, role: str):
+    """Give a user without a broadcast position one at the role's latest broadcast
+
+    Without it read_seq would default to 0 and a newly added member would
+    find the role's whole broadcast history unread.
+    """
+    if store.query_one("SELECT 1 FROM broadcast_inbox WHERE user_id = ?", (user_id,)):
+        return
+    with store.transaction():
+        store.conn.execute(
+            "INSERT OR IGNORE INTO broadcast_inbox (user_id, read_seq) "
+            "SELECT ?, COALESCE((SELECT last_seq FROM role_broadcast_counters WHERE role = ?), 0)",
+            (user_id, role)
+        )
+
+def get_unread_notifications(user_id: int, limit: int, inbox: Optional[Dict] = None) -> List[Dict]:
+    """Get the oldest unread notifications of a user, personal and role broadcasts merged"""
+    inbox = inbox or get_inbox(user_id)
+    return get_store().query(
+        "SELECT * FROM ("
+        "  SELECT * FROM (SELECT id, type, message, date FROM notifications "
+        "                 WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?)"
+        "  UNION ALL"
+        "  SELECT * FROM (SELECT id, type, message, date FROM role_broadcasts "
+        "                 WHERE role = ? AND seq > ? ORDER BY seq LIMIT ?)"
+        ") ORDER BY date LIMIT ?",
+        (user_id, inbox["read_upto"], limit, inbox["role"], inbox["broadcast_read_seq"], limit, limit)
+    )
+
+def mark_all_notifications_read(user_id: int):
+    """Mark a user's whole inbox read by moving the watermarks - O(1) however large it is"""
+    store = get_store()
+    role = get_user(user_id)["role"]
+    with store.transaction():
+        store.conn.execute(
+            "UPDATE notification_inbox SET read_upto = last_id, unread = 0 WHERE user_id = ?", (user_id,)
+        )
+        store.conn.execute(
+            "INSERT OR REPLACE INTO broadcast_inbox (user_id, read_seq) "
+            "SELECT ?, COALESCE((SELECT last_seq FROM role_broadcast_counters WHERE role = ?), 0)",
+            (user_id, role)
+        )
+
+def ensure_notification_inbox(store: RewardsStore):
+    """Build the inbox counters from the notification flags when missing (first open / upgrade)"""
+    if store.is_empty("notification_inbox"):
+        with store.transaction():
+            # Watermark: everything before a user's oldest unread notification is read
+            store.conn.execute(
+                "INSERT OR IGNORE INTO notification_inbox (user_id, read_upto, last_id) "
+                "SELECT user_id, COALESCE(MIN(CASE WHEN read = 0 THEN id END) - 1, MAX(id)), MAX(id) "
+                "FROM notifications GROUP BY user_id"
+            )
+            store.conn.execute(
+                "UPDATE notification_inbox SET unread = (SELECT COUNT(*) FROM notifications n "
+                "WHERE n.user_id = notification_inbox.user_id AND n.id > notification_inbox.read_upto)"
+            )
 
 def add_audit_log(user_id: int, action: str, details: str):
     """Add entry to audit log"""
-    st.session_state.audit_log.append({
-        "id": st.session_state.next_audit_id,
-        "user_id": user_id,
-        "action": action,
-        "details": details,
-        "date": datetime.now().strftime("%Y-%m-%d %H:%M")
-    })
-    st.session_state.next_audit_id += 1
-
-def generate_leaderboard() -> pd.DataFrame:
-    """Generate leaderboard with all users ranked by points"""
-    leaderboard = []
-    for user in st.session_state.users:
-        if user["role"] == "user":  # Exclude admins from leaderboard
-            total_points = get_user_total_points(user["id"])
-            level = get_user_level(total_points)
-            leaderboard.append({
-                "Rank": 0,
-                "Name": user["name"],
-                "Department": user["department"],
-                "Points": total_points,
-                "Level": f"{level['icon']} {level['name']}",
-                "level_id": level["id"]
-            })
+    store = get_store()
+    with store.transaction():
+        store.insert("audit_log", {
+            "user_id": user_id,
+            "action": action,
+            "details": details,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M")
+        })
+        store.conn.execute("INSERT OR IGNORE INTO audit_actions (action) VALUES (?)", (action,))
+        store.conn.execute("INSERT OR IGNORE INTO audit_users (user_id) VALUES (?)", (user_id,))
+
+def ensure_audit_facets(store: RewardsStore):
+    """Build the distinct audit actions/actors when missing (first open / upgrade)"""
+    if store.is_empty("audit_actions"):
+        with store.transaction():
+            store.conn.execute("INSERT OR IGNORE INTO audit_actions SELECT DISTINCT action FROM audit_log")
+            store.conn.execute("INSERT OR IGNORE INTO audit_users SELECT DISTINCT user_id FROM audit_log")
+
+def query_audit_log(filters: Dict, limit: Optional[int], before: Optional[Tuple[str, int]] = None,
+                    store: Optional[RewardsStore] = None) -> List[Dict]:
+    """Get audit entries newest-first matching the filters, starting after a (date, id) keyset cursor"""
+    clauses, params = ["date >= ?"], [filters["since"]]
+    if filters.get("action"):
+        clauses.append("action = ?")
+        params.append(filters["action"])
+    if filters.get("user_id"):
+        clauses.append("user_id = ?")
+        params.append(filters["user_id"])
+    if before is not None:
+        clauses.append("(date, id) < (?, ?)")
+        params.extend(before)
+    sql = f"SELECT * FROM audit_log WHERE {' AND '.join(clauses)} ORDER BY date DESC, id DESC"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return (store or get_store()).query(sql, tuple(params))
+
+# Exports - chunked readers and background file jobs. Readers take the store
+# explicitly: they run on export worker threads, outside any Streamlit script run.
+
+EMPLOYEE_EXPORT_SQL = """
+    SELECT u.id, u.name, u.department, COALESCE(b.earned - b.redeemed, 0) AS total_points,
+           COALESCE(SUM(CASE WHEN t.category = 'training' THEN t.points END), 0) AS training,
+           COALESCE(SUM(CASE WHEN t.category = 'innovation' THEN t.points END), 0) AS innovation,
+           COALESCE(SUM(CASE WHEN t.category = 'events' THEN t.points END), 0) AS events,
+           COALESCE(SUM(CASE WHEN t.category = 'performance' THEN t.points END), 0) AS performance
+    FROM users u
+    LEFT JOIN user_balances b ON b.user_id = u.id
+    LEFT JOIN user_category_totals t ON t.user_id = u.id
+    WHERE u.role = 'user' AND u.id > ?
+    GROUP BY u.id ORDER BY u.id LIMIT ?
+"""
+
+def iter_employee_export(store: RewardsStore, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Yield the All Employees table as DataFrame chunks, keyset-paged by user id"""
+    last_id = 0
+    while True:
+        rows = store.query(EMPLOYEE_EXPORT_SQL, (last_id, chunk_rows))
+        if not rows:
+            return
+        levels = [LEVELS[level_id - 1] for level_id in get_level_ids([row["total_points"] for row in rows])]
+        yield pd.DataFrame({
+            "ID": [row["id"] for row in rows],
+            "Name": [row["name"] for row in rows],
+            "Department": [row["department"] for row in rows],
+            "Total Points": [row["total_points"] for row in rows],
+            "Level": [f"{level['icon']} {level['name']}" for level in levels],
+            "Training": [row["training"] for row in rows],
+            "Innovation": [row["innovation"] for row in rows],
+            "Events": [row["events"] for row in rows],
+            "Performance": [row["performance"] for row in rows],
+        })
+        last_id = rows[-1]["id"]
+
+def iter_audit_export(store: RewardsStore, filters: Dict, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Yield the filtered audit log newest-first as DataFrame chunks, keyset-paged by (date, id)"""
+    names = {row["id"]: row["name"] for row in store.query("SELECT id, name FROM users")}
+    before = None
+    while True:
+        rows = query_audit_log(filters, chunk_rows, before, store=store)
+        if not rows:
+            return
+        yield pd.DataFrame({
+            "Date": [row["date"] for row in rows],
+            "User": [names.get(row["user_id"], f"User #{row['user_id']}") for row in rows],
+            "Action": [row["action"].replace("_", " ").title() for row in rows],
+            "Details": [row["details"] for row in rows],
+        })
+        before = (rows[-1]["date"], rows[-1]["id"])
+
+def write_export_file(chunks, path: str, fmt: str) -> int:
+    """Stream DataFrame chunks into a CSV or Parquet file and return the number of rows written"""
+    rows = 0
+    if fmt == "Parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)  # one row group per chunk
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            pq.write_table(pa.table({}), path)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            for chunk in chunks:
+                chunk.to_csv(f, header=rows == 0, index=False)
+                rows += len(chunk)
+    return rows
+
+class ExportJobs:
+    """Background export jobs shared by all sessions; each writes one file under EXPORT_DIR"""
+
+    def __init__(self, max_workers: int = 2):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rewards-export")
+
+    def submit(self, kind: str, fmt: str, make_chunks, requested_by: int) -> str:
+        """Queue an export; make_chunks() is called on the worker and must yield DataFrames"""
+        job_id = uuid.uuid4().hex[:8]
+        extension = "parquet" if fmt == "Parquet" else "csv"
+        job = {
+            "id": job_id, "kind": kind, "format": fmt, "status": "queued", "rows": 0, "error": None,
+            "requested_by": requested_by, "started": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "created": time.time(),
+            "path": os.path.join(EXPORT_DIR, f"{kind}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{job_id}.{extension}"),
+        }
+        self.prune()
+        with self._lock:
+            self._jobs[job_id] = job
+        self._executor.submit(self._run, job, make_chunks)
+        return job_id
+
+    def prune(self, max_age_hours: float = EXPORT_RETENTION_HOURS):
+        """Forget finished jobs and delete export files older than the retention window"""
+        cutoff = time.time() - max_age_hours * 3600
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job["status"] in ("done", "failed") and job["created"] < cutoff:
+                    del self._jobs[job_id]
+            active = {job["path"] for job in self._jobs.values()}
+        if not os.path.isdir(EXPORT_DIR):
+            return
+        for name in os.listdir(EXPORT_DIR):  # also sweeps files left by earlier processes
+            path = os.path.join(EXPORT_DIR, name)
+            try:
+                if path not in active and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass  # removed concurrently
+
+    def list(self, kind: str) -> List[Dict]:
+        """Jobs of one kind, newest first"""
+        with self._lock:
+            return sorted((dict(job) for job in self._jobs.values() if job["kind"] == kind),
+                          key=lambda job: job["started"], reverse=True)
+
+    def _run(self, job: Dict, make_chunks):
+        job["status"] = "running"
+        partial = job["path"] + ".part"
+        try:
+            os.makedirs(EXPORT_DIR, exist_ok=True)
+            job["rows"] = write_export_file(make_chunks(), partial, job["format"])
+            os.replace(partial, job["path"])  # only complete files become downloadable
+            job["status"] = "done"
+        except Exception as e:
+            job["status"], job["error"] = "failed", str(e)
+            if os.path.exists(partial):
+                os.remove(partial)
+
+@st.cache_resource(show_spinner=False)
+def get_export_jobs() -> ExportJobs:
+    """Return the process-wide export job runner, clearing exports past retention"""
+    jobs = ExportJobs()
+    jobs.prune()
+    return jobs
+
+def read_export_file(path: str) -> bytes:
+    """Contents of a finished export, read when its download is requested"""
+    with open(path, "rb") as f:
+        return f.read()
+
+# Outbound delivery - notifications are queued in the outbox inside the write
+# transaction; a background worker sends them, so approvals never wait on I/O.
+
+class SmtpChannel:
+    """Email delivery over SMTP (one connection per batch)"""
+    name = "email"
+
+    def __init__(self, server: str, sender: str):
+        host, _, port = server.partition(":")
+        self.host, self.port, self.sender = host, int(port or 25), sender
+
+    def send_batch(self, messages: List[Dict]) -> Dict[int, Optional[str]]:
+        results = {}
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            for msg in messages:
+                if not msg["recipients"]:
+                    results[msg["id"]] = None  # nobody to mail (e.g. no email on file)
+                    continue
+                email = EmailMessage()
+                email["From"], email["To"] = self.sender, ", ".join(r["email"] for r in msg["recipients"])
+                email["Subject"] = f"Rewards: {msg['type'].replace('_', ' ')}"
+                email.set_content(msg["message"])
+                try:
+                    smtp.send_message(email)
+                    results[msg["id"]] = None
+                except smtplib.SMTPException as e:
+                    results[msg["id"]] = str(e)
+        return results
+
+class WebhookFileChannel:
+    """Webhook stand-in: appends one JSON payload per notification to a local file"""
+    name = "webhook"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def send_batch(self, messages: List[Dict]) -> Dict[int, Optional[str]]:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for msg in messages:
+                f.write(json.dumps({
+                    "id": msg["id"], "type": msg["type"], "message": msg["message"],
+                    "user_id": msg["user_id"], "role": msg["role"],
+                    "recipients": [r["id"] for r in msg["recipients"]], "created_at": msg["created_at"],
+                }) + "\n")
+        return {msg["id"]: None for msg in messages}
+
+def get_delivery_channels() -> Dict[str, object]:
+    """Outbound channels enabled by configuration, by name"""
+    channels = []
+    if SMTP_SERVER:
+        channels.append(SmtpChannel(SMTP_SERVER, SMTP_SENDER))
+    if WEBHOOK_FILE:
+        channels.append(WebhookFileChannel(WEBHOOK_FILE))
+    return {channel.name: channel for channel in channels}
+
+def enqueue_delivery(store: RewardsStore, notif_type: str, message: str,
+                     user_id: Optional[int] = None, role: Optional[str] = None):
+    """Queue a notification for every enabled channel (call inside the write transaction)"""
+    worker = get_delivery_worker()
+    if worker is None:
+        return
+    created = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    store.conn.executemany(
+        "INSERT INTO outbox (channel, user_id, role, type, message, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        [(name, user_id, role, notif_type, message, created) for name in worker.channels]
+    )
+    worker.wake()  # non-blocking; the worker picks the rows up once they are committed
+
+class DeliveryWorker(threading.Thread):
+    """Background sender for the outbox: batched per channel, retried with exponential backoff"""
+
+    BATCH_SIZE = 50
+    MAX_ATTEMPTS = 6
+    BACKOFF_SECONDS = 5  # 5s, 10s, 20s, ... between attempts
+    POLL_SECONDS = 5
+    FAILED_RETENTION_DAYS = 30  # undeliverable rows are kept this long for inspection
+
+    def __init__(self, store: RewardsStore, channels: Dict[str, object]):
+        super().__init__(name="rewards-delivery", daemon=True)
+        self.store, self.channels = store, channels
+        self._wakeup = threading.Event()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def run(self):
+        while True:
+            self._wakeup.wait(self.POLL_SECONDS)
+            self._wakeup.clear()
+            try:
+                self.prune()
+                while self.deliver_due():
+                    pass
+            except Exception:
+                time.sleep(self.POLL_SECONDS)  # store busy or closed - try again later
+
+    def prune(self):
+        """Drop rows no longer worth keeping: delivered ones and long-failed ones"""
+        cutoff = (datetime.now() - timedelta(days=self.FAILED_RETENTION_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+        with self.store.transaction():
+            self.store.conn.execute(
+                "DELETE FROM outbox WHERE status = 'sent' OR (status = 'failed' AND created_at < ?)", (cutoff,)
+            )
+
+    def deliver_due(self) -> int:
+        """Send one batch per channel of the messages that are due; return how many were handled"""
+        handled = 0
+        for name, channel in self.channels.items():
+            batch = self.store.query(
+                "SELECT * FROM outbox WHERE status = 'pending' AND channel = ? AND next_attempt <= ? "
+                "ORDER BY id LIMIT ?",
+                (name, time.time(), self.BATCH_SIZE)
+            )
+            if not batch:
+                continue
+            for msg in batch:
+                msg["recipients"] = self._recipients(msg)
+            try:
+                results = channel.send_batch(batch)  # outside the store lock - network/file I/O
+            except Exception as e:
+                results = {msg["id"]: str(e) or type(e).__name__ for msg in batch}
+            self._record(batch, results)
+            handled += len(batch)
+        return handled
+
+    def _recipients(self, msg: Dict) -> List[Dict]:
+        if msg["user_id"] is not None:
+            return self.store.query("SELECT id, email FROM users WHERE id = ?", (msg["user_id"],))
+        return self.store.query("SELECT id, email FROM users WHERE role = ? ORDER BY id", (msg["role"],))
+
+    def _record(self, batch: List[Dict], results: Dict[int, Optional[str]]):
+        with self.store.transaction():
+            for msg in batch:
+                error = results.get(msg["id"], "no result from channel")
+                if error is None:
+                    # Delivered rows have nothing left to do - the queue only holds outstanding work
+                    self.store.conn.execute("DELETE FROM outbox WHERE id = ?", (msg["id"],))
+                    continue
+                attempts = msg["attempts"] + 1
+                self.store.conn.execute(
+                    "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                    ("failed" if attempts >= self.MAX_ATTEMPTS else "pending", attempts,
+                     time.time() + self.BACKOFF_SECONDS * 2 ** (attempts - 1), error, msg["id"])
+                )
+
+@st.cache_resource(show_spinner=False)
+def get_delivery_worker() -> Optional[DeliveryWorker]:
+    """Return the process-wide delivery worker (None when no outbound channel is configured)"""
+    channels = get_delivery_channels()
+    if not channels:
+        return None
+    worker = DeliveryWorker(get_store(), channels)
+    worker.start()
+    return worker
+
+def approve_reward_requests(requests: List[Dict], approved_by: int) -> List[Dict]:
+    """Approve reward requests in one transaction and return the ones this call approved
+
+    Requests that are no longer pending (handled meanwhile by another session)
+    are skipped. Badges, level-ups and notifications are evaluated once per
+    affected user, not once per request.
+    """
+    store = get_store()
+    today = datetime.now().strftime("%Y-%m-%d")
+    points_by_user = {}
+    requests_by_user = {}
+    approved = []
+    
+    with store.transaction():
+        balances_before = get_user_balances(list({req["user_id"] for req in requests}))
+        for req in requests:
+            if not store.update("reward_requests", req["id"], where={"status": "pending"},
+                                status="approved", approved_by=approved_by, approved_date=today):
+                continue
+            approved.append(req)
+            adjust_claim_key(store, req["user_id"], req["category"], req["description"],
+                             req["date_submitted"], -1)
+            add_points_entry(req["user_id"], req["points_requested"], req["category"],
+                             req["description"], req["date_submitted"], approved_by)
+            add_audit_log(approved_by, "approved_reward_request",
+                          f"Approved {req['points_requested']} points for {get_user(req['user_id'])['name']}")
+            points_by_user[req["user_id"]] = points_by_user.get(req["user_id"], 0) + req["points_requested"]
+            requests_by_user[req["user_id"]] = requests_by_user.get(req["user_id"], 0) + 1
+        
+        for user_id, points in points_by_user.items():
+            check_and_award_badges(user_id)
+            
+            balance_before = balances_before.get(user_id, 0)
+            old_level = get_user_level(balance_before)
+            new_level = get_user_level(balance_before + points)
+            if new_level["id"] > old_level["id"]:
+                add_notification(user_id, "level_up",
+                               f"🎉 Congratulations! You've reached {new_level['name']} level!")
+            
+            if requests_by_user[user_id] == 1:
+                message = f"✅ Your request for {points} points has been approved!"
+            else:
+                message = f"✅ {requests_by_user[user_id]} of your requests ({points:,} points) have been approved!"
+            add_notification(user_id, "points_earned", message)
     
-    # Sort by points and assign ranks
-    leaderboard.sort(key=lambda x: x["Points"], reverse=True)
-    for i, entry in enumerate(leaderboard, 1):
-        entry["Rank"] = i
+    return approved
+
+def reject_reward_requests(requests: List[Dict], reviewed_by: int) -> List[Dict]:
+    """Reject reward requests in one transaction, notifying each affected user once
+
+    Returns the requests this call rejected; ones no longer pending are skipped.
+    """
+    store = get_store()
+    today = datetime.now().strftime("%Y-%m-%d")
+    rejected_by_user = {}
+    rejected = []
+    
+    with store.transaction():
+        for req in requests:
+            if not store.update("reward_requests", req["id"], where={"status": "pending"},
+                                status="rejected", reviewed_by=reviewed_by, reviewed_date=today):
+                continue
+            rejected.append(req)
+            adjust_claim_key(store, req["user_id"], req["category"], req["description"],
+                             req["date_submitted"], -1)
+            add_audit_log(reviewed_by, "rejected_reward_request",
+                          f"Rejected request from {get_user(req['user_id'])['name']}")
+            rejected_by_user.setdefault(req["user_id"], []).append(req)
+        
+        for user_id, user_requests in rejected_by_user.items():
+            if len(user_requests) == 1:
+                message = (f"❌ Your request for {user_requests[0]['points_requested']} points has been "
+                           "rejected. Contact HR for details.")
+            else:
+                message = f"❌ {len(user_requests)} of your requests have been rejected. Contact HR for details."
+            add_notification(user_id, "request_rejected", message)
+    
+    return rejected
+
+def pending_rewards_where(filters: Dict) -> Tuple[str, List]:
+    """WHERE clause (and params) selecting the pending reward requests that match the queue filters"""
+    clauses, params = ["r.status = 'pending'"], []
+    if filters.get("department"):
+        clauses.append("u.department = ?")
+        params.append(filters["department"])
+    if filters.get("category"):
+        clauses.append("r.category = ?")
+        params.append(filters["category"])
+    if filters.get("min_age_days"):
+        clauses.append("r.date_submitted <= ?")
+        params.append((datetime.now() - timedelta(days=filters["min_age_days"])).strftime("%Y-%m-%d"))
+    if filters.get("points_range"):
+        clauses.append("r.points_requested BETWEEN ? AND ?")
+        params.extend(filters["points_range"])
+    return " AND ".join(clauses), params
+
+def count_pending_rewards(filters: Dict) -> int:
+    """Count the pending reward requests matching the queue filters"""
+    where, params = pending_rewards_where(filters)
+    return get_store().scalar(
+        f"SELECT COUNT(*) FROM reward_requests r JOIN users u ON u.id = r.user_id WHERE {where}", tuple(params)
+    )
+
+def query_pending_rewards(filters: Dict, sort: str, limit: int, offset: int) -> List[Dict]:
+    """Get one page of pending reward request summaries (no detail columns)"""
+    where, params = pending_rewards_where(filters)
+    return get_store().query(
+        "SELECT r.id, r.user_id, r.earn_type, r.category, r.points_requested, r.date_submitted, "
+        "u.name, u.department FROM reward_requests r JOIN users u ON u.id = r.user_id "
+        f"WHERE {where} ORDER BY {PENDING_SORTS[sort]} LIMIT ? OFFSET ?",
+        (*params, limit, offset)
+    )
+
+def get_pending_rewards(request_ids: Optional[List[int]] = None, filters: Optional[Dict] = None) -> List[Dict]:
+    """Get full pending reward requests by id, or every one matching the queue filters"""
+    where, params = pending_rewards_where(filters or {})
+    if request_ids is not None:
+        where += f" AND r.id IN ({', '.join(str(int(rid)) for rid in request_ids)})"
+    return get_store().query(
+        f"SELECT r.* FROM reward_requests r JOIN users u ON u.id = r.user_id WHERE {where} ORDER BY r.id",
+        tuple(params)
+    )
+
+def generate_leaderboard(count: Optional[int] = None, start_rank: int = 1) -> pd.DataFrame:
+    """Generate leaderboard rows ranked by points (all users, or `count` rows from `start_rank`)"""
+    leaderboard = []
+    users_by_id = get_user_index()["by_id"]
+    store = get_store()
+    
+    # The index already holds users in rank order - no sort needed. It is shared
+    # and updated in place by writers, so the page is copied out under the lock.
+    with store.lock:
+        rank_index = get_balance_rank_index()  # Admins are not in the index
+        ranked = rank_index.top(count or len(rank_index), start_rank)
+    level_ids = get_level_ids([total_points for _, _, total_points in ranked])
+    for (rank, user_id, total_points), level_id in zip(ranked, level_ids):
+        user = users_by_id[user_id]
+        level = LEVELS[level_id - 1]
+        leaderboard.append({
+            "Rank": rank,
+            "Name": user["name"],
+            "Department": user["department"],
+            "Points": total_points,
+            "Level": f"{level['icon']} {level['name']}",
+            "level_id": level["id"]
+        })
     
     return pd.DataFrame(leaderboard)
 
+def get_ledger_frame() -> pd.DataFrame:
+    """Get the columnar ledger mirror, synced with any rows appended since last use"""
+    store = get_store()
+    mirror = store.index("ledger_frame", lambda: LedgerFrame.restore(store))
+    frame = mirror.refresh(store)
+    mirror.snapshot_if_due(store)
+    return frame
+
+def get_org_analytics() -> Dict:
+    """Compute organization metrics and chart series with vectorized groupbys over the ledger"""
+    store = get_store()
+    
+    def compute():
+        ledger = get_ledger_frame()
+        approved = ledger[ledger["status"] == "approved"]
+        users = pd.DataFrame(get_users())
+        employees = users.loc[users["role"] == "user", ["id", "department"]].set_index("id")
+        
+        earned = approved.groupby("user_id")["points"].sum()
+        redeemed = pd.Series({
+            row["user_id"]: row["redeemed"]
+            for row in store.query("SELECT user_id, redeemed FROM user_balances WHERE redeemed != 0")
+        }, dtype="int64")
+        balances = (earned.reindex(employees.index, fill_value=0)
+                    - redeemed.reindex(employees.index, fill_value=0))
+        
+        level_ids = pd.Series(get_level_ids(balances.to_numpy()))
+        level_counts = level_ids.value_counts().reindex(range(1, len(LEVELS) + 1), fill_value=0)
+        level_counts.index = [level["name"] for level in LEVELS]
+        
+        return {
+            "total_users": len(employees),
+            "total_points": int(approved["points"].sum()),
+            "dept_points": balances.groupby(employees["department"], sort=False).sum(),
+            "level_counts": level_counts[level_counts > 0],
+        }
+    return store.cached(("org_analytics", tuple(LEVEL_THRESHOLDS)), compute, LEDGER_TABLES)
+
 # ==============================================================================
 # SECTION 4: UI RENDERING FUNCTIONS - EMPLOYEE DASHBOARD
 # ==============================================================================
 
+def render_sections(sections: Dict[str, Callable[[], None]], key: str):
+    """Render a tab-style section switcher and run only the selected section's renderer
+
+    Unlike st.tabs, which computes every panel on each run, hidden sections
+    cost nothing here.
+    """
+    if st.session_state.get(key) not in sections:
+        st.session_state.pop(key, None)  # e.g. a section that this role does not have
+    choice = st.radio("Section", list(sections), horizontal=True, key=key, label_visibility="collapsed")
+    st.markdown("---")
+    sections[choice]()
+
 def render_employee_dashboard():
     """Render employee dashboard with profile, points, activities, and redemption"""
     load_css()
     
-    current_user = next(u for u in st.session_state.users if u["id"] == st.session_state.current_user_id)
-    total_points = get_user_total_points(st.session_state.current_user_id)
-    current_level = get_user_level(total_points)
-    points_by_category = get_points_by_category(st.session_state.current_user_id)
-    
-    # Next level calculation
-    next_level = None
-    points_to_next = 0
-    if current_level["id"] < len(LEVELS):
-        next_level = LEVELS[current_level["id"]]
-        points_to_next = next_level["points_min"] - total_points
+    current_user = get_user(st.session_state.current_user_id)
+    view = get_user_view_model(st.session_state.current_user_id)
+    total_points = view["total_points"]
+    current_level = view["level"]
+    next_level = view["next_level"]
+    points_to_next = view["points_to_next"]
     
     # Profile Header
     # Profile header - get title if it exists
@@ -500,26 +2433,20 @@ def render_employee_dashboard():
         </div>
     """, unsafe_allow_html=True)
     
-    # Tabs for different sections
-    tabs = st.tabs(["📊 Overview", "🎯 Submit Request", "📜 My History", "🎁 Redeem Points", "🏆 My Badges"])
-    
-    with tabs[0]:  # Overview
-        render_employee_overview(points_by_category, total_points)
-    
-    with tabs[1]:  # Submit Request
-        render_submit_reward_request()
-    
-    with tabs[2]:  # History
-        render_employee_history()
-    
-    with tabs[3]:  # Redemption
-        render_redemption_section(total_points)
-    
-    with tabs[4]:  # Badges
-        render_employee_badges()
+    # Sections (only the selected one is computed)
+    render_sections({
+        "📊 Overview": lambda: render_employee_overview(view),
+        "🎯 Submit Request": render_submit_reward_request,
+        "📜 My History": lambda: render_employee_history(view["history"]),
+        "🎁 Redeem Points": lambda: render_redemption_section(total_points),
+        "🏆 My Badges": render_employee_badges,
+    }, key="employee_section")
 
-def render_employee_overview(points_by_category: Dict, total_points: int):
+def render_employee_overview(view: Dict):
     """Render employee overview with charts and metrics"""
+    points_by_category = view["points_by_category"]
+    recent_activities = view["recent_activities"]
+    chart_scope, chart_version = view["user_id"], view["ledger_version"]
     st.markdown("### 📊 Points Breakdown")
     
     # Category breakdown cards
@@ -554,7 +2481,7 @@ def render_employee_overview(points_by_category: Dict, total_points: int):
     with col1:
         # Pie chart of points by category
         if points_by_category and len(points_by_category) > 0:
-            try:
+            def build_pie():
                 fig_pie = go.Figure(data=[go.Pie(
                     labels=list(points_by_category.keys()),
                     values=list(points_by_category.values()),
@@ -569,6 +2496,10 @@ def render_employee_overview(points_by_category: Dict, total_points: int):
                     height=350,
                     showlegend=True
                 )
+                return fig_pie
+            
+            try:
+                fig_pie = get_figure("category_pie", chart_scope, chart_version, build_pie)
                 st.plotly_chart(fig_pie, use_container_width=True)
             except Exception as e:
                 st.info("No points data available for chart")
@@ -577,17 +2508,21 @@ def render_employee_overview(points_by_category: Dict, total_points: int):
     
     with col2:
         # Bar chart of recent activities
-        recent_activities = [p for p in st.session_state.points_ledger 
-                           if p["user_id"] == st.session_state.current_user_id and p["status"] == "approved"]
-        recent_activities.sort(key=lambda x: x["date"], reverse=True)
-        recent_activities = recent_activities[:10]
-        
         if recent_activities and len(recent_activities) > 0:
-            try:
-                df_activities = pd.DataFrame(recent_activities)
-                fig_bar = px.bar(df_activities, x='date', y='points', color='category',
-                               title="Recent Points Earned")
+            def build_bar():
+                # One trace per category, as px.bar(color='category') draws it - without pandas
+                fig_bar = go.Figure(data=[
+                    go.Bar(
+                        x=[a["date"] for a in recent_activities if a["category"] == category],
+                        y=[a["points"] for a in recent_activities if a["category"] == category],
+                        name=category
+                    )
+                    for category in dict.fromkeys(a["category"] for a in recent_activities)
+                ])
                 fig_bar.update_layout(
+                    title=dict(text="Recent Points Earned"),
+                    barmode='relative',
+                    legend_title_text='category',
                     paper_bgcolor='transparent',
                     plot_bgcolor='transparent',
                     font=dict(color='white', family='Outfit'),
@@ -595,6 +2530,10 @@ def render_employee_overview(points_by_category: Dict, total_points: int):
                     xaxis=dict(title="Date"),
                     yaxis=dict(title="Points")
                 )
+                return fig_bar
+            
+            try:
+                fig_bar = get_figure("recent_activity_bar", chart_scope, chart_version, build_bar)
                 st.plotly_chart(fig_bar, use_container_width=True)
             except Exception as e:
                 st.info("No activity data available for chart")
@@ -615,7 +2554,7 @@ def render_submit_reward_request():
             help="Select the type of activity you completed"
         )
         
-        selected_earn = next(et for et in EARN_TYPES if et["name"] == earn_type)
+        selected_earn = EARN_TYPES_BY_NAME[earn_type]
         category = selected_earn["category"]
         
         # Dynamic points calculation based on type
@@ -671,7 +2610,6 @@ def render_submit_reward_request():
             else:
                 # Create new request
                 new_request = {
-                    "id": st.session_state.next_request_id,
                     "user_id": st.session_state.current_user_id,
                     "earn_type": earn_type,
                     "category": category,
@@ -682,39 +2620,30 @@ def render_submit_reward_request():
                     "justification": justification,
                     "attachment_desc": attachment_desc
                 }
-                st.session_state.reward_requests.append(new_request)
-                st.session_state.next_request_id += 1
+                with get_store().transaction():
+                    get_store().insert("reward_requests", new_request)
+                    adjust_claim_key(get_store(), new_request["user_id"], category, description, date_today, 1)
                 
                 # Add audit log
                 add_audit_log(st.session_state.current_user_id, "submitted_reward_request", 
                             f"Submitted request for {calculated_points} points - {earn_type}")
                 
-                # Notify admins
-                for user in st.session_state.users:
-                    if user["role"] == "admin":
-                        add_notification(user["id"], "admin_request", 
-                                       f"New reward request from {st.session_state.users[st.session_state.current_user_id-1]['name']}")
+                # Notify admins (one broadcast, whatever the number of admins)
+                add_role_notification("admin", "admin_request",
+                                      f"New reward request from {get_user(st.session_state.current_user_id)['name']}")
                 
                 st.success("✅ Request submitted successfully! It will be reviewed by HR.")
                 st.balloons()
 
-def render_employee_history():
+def render_employee_history(points_history: List[Dict]):
     """Render employee's reward request and redemption history"""
     st.markdown("### 📜 My Points History")
     
-    # Points earned history
+    # Points earned history (newest first, from the cached view model)
     st.markdown("#### 💰 Points Earned")
-    user_points = [p for p in st.session_state.points_ledger 
-                   if p["user_id"] == st.session_state.current_user_id]
-    
-    if user_points:
-        df_points = pd.DataFrame(user_points)
-        df_points = df_points.sort_values('date', ascending=False)
-        df_points['status'] = df_points['status'].apply(
-            lambda x: f"✅ {x.upper()}" if x == "approved" else f"⏳ {x.upper()}"
-        )
+    if points_history:
         st.dataframe(
-            df_points[['date', 'category', 'description', 'points', 'status']],
+            points_history,
             use_container_width=True,
             hide_index=True
         )
@@ -725,8 +2654,10 @@ def render_employee_history():
     
     # Pending requests
     st.markdown("#### ⏳ Pending Requests")
-    pending_requests = [r for r in st.session_state.reward_requests 
-                       if r["user_id"] == st.session_state.current_user_id and r["status"] == "pending"]
+    pending_requests = get_store().query(
+        "SELECT * FROM reward_requests WHERE user_id = ? AND status = 'pending'",
+        (st.session_state.current_user_id,)
+    )
     
     if pending_requests:
         df_pending = pd.DataFrame(pending_requests)
@@ -742,8 +2673,9 @@ def render_employee_history():
     
     # Redemption history
     st.markdown("#### 🎁 Redemption History")
-    user_redemptions = [r for r in st.session_state.redemption_requests 
-                       if r["user_id"] == st.session_state.current_user_id]
+    user_redemptions = get_store().query(
+        "SELECT * FROM redemption_requests WHERE user_id = ?", (st.session_state.current_user_id,)
+    )
     
     if user_redemptions:
         df_redemptions = pd.DataFrame(user_redemptions)
@@ -758,47 +2690,27 @@ def render_employee_history():
 
 def render_redemption_section(available_points: int):
     """Render redemption catalog and request form"""
-    st.markdown("### 🎁 Redeem Your Points")
-    st.markdown(f"**Available Points:** {available_points:,} 💰")
-    
-    # Redemption catalog
-    st.markdown("#### Available Rewards")
-    
-    cols = st.columns(3)
-    for i, option in enumerate(REDEMPTION_OPTIONS):
-        with cols[i % 3]:
-            can_afford = available_points >= option["points"]
-            border_color = "#4ade80" if can_afford else "#64748b"
-            
-            st.markdown(f"""
-                <div style="background: rgba(30, 41, 59, 0.6); backdrop-filter: blur(10px);
-                            border-radius: 16px; padding: 20px; border: 2px solid {border_color};
-                            margin-bottom: 16px; text-align: center; min-height: 220px;">
-                    <div style="font-size: 48px; margin-bottom: 12px;">{option['icon']}</div>
-                    <div style="font-size: 18px; font-weight: 700; color: white; margin-bottom: 8px;">
-                        {option['name']}
-                    </div>
-                    <div style="font-size: 14px; color: #94a3b8; margin-bottom: 12px;">
-                        {option['description']}
-                    </div>
-                    <div style="font-size: 24px; font-weight: 700; color: #3b82f6; margin-bottom: 8px;">
-                        {option['points']:,} pts
-                    </div>
-                    <div style="font-size: 13px; color: #94a3b8; margin-bottom: 12px;">
-                        Value: {option['value']}
-                    </div>
-                    <div style="padding: 8px 16px; background: {'#4ade80' if can_afford else '#64748b'}; 
-                                border-radius: 8px; font-size: 12px; font-weight: 600; color: white;">
-                        {'✓ AVAILABLE' if can_afford else '🔒 LOCKED'}
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
+    st.markdown("### 🎁 Redeem Your Points")
+    st.markdown(f"**Available Points:** {available_points:,} 💰")
+    
+    # Redemption catalog
+    st.markdown("#### Available Rewards")
+    
+    render_card_grid("catalog", [
+        {**option, "state": "available", "status": "✓ AVAILABLE"} if available_points >= option["points"]
+        else {**option, "state": "locked", "status": "🔒 LOCKED"}
+        for option in REDEMPTION_OPTIONS
+    ])
     
     st.markdown("<br>", unsafe_allow_html=True)
     
     # Redemption request form
     st.markdown("#### Submit Redemption Request")
-    
+    render_redemption_form(available_points)
+
+@st.fragment
+def render_redemption_form(available_points: int):
+    """Render the redemption request form (submitting reruns only the form)"""
     col1, col2 = st.columns([2, 1])
     
     with col1:
@@ -810,7 +2722,7 @@ def render_redemption_section(available_points: int):
                 options=[opt["name"] for opt in affordable_options]
             )
             
-            selected_opt = next(opt for opt in REDEMPTION_OPTIONS if opt["name"] == selected_redemption)
+            selected_opt = REDEMPTION_OPTIONS_BY_NAME[selected_redemption]
             
             st.info(f"💰 Cost: **{selected_opt['points']:,} points** | Value: **{selected_opt['value']}**")
             
@@ -822,7 +2734,6 @@ def render_redemption_section(available_points: int):
             if st.button("Submit Redemption Request", type="primary", use_container_width=True):
                 # Create redemption request
                 new_redemption = {
-                    "id": st.session_state.next_redemption_id,
                     "user_id": st.session_state.current_user_id,
                     "redemption_name": selected_redemption,
                     "points_cost": selected_opt["points"],
@@ -831,18 +2742,15 @@ def render_redemption_section(available_points: int):
                     "fulfillment_status": "pending",
                     "notes": notes
                 }
-                st.session_state.redemption_requests.append(new_redemption)
-                st.session_state.next_redemption_id += 1
+                get_store().insert("redemption_requests", new_redemption)
                 
                 # Add audit log
                 add_audit_log(st.session_state.current_user_id, "submitted_redemption",
                             f"Requested {selected_redemption} redemption")
                 
-                # Notify admins
-                for user in st.session_state.users:
-                    if user["role"] == "admin":
-                        add_notification(user["id"], "admin_redemption",
-                                       f"New redemption request from {st.session_state.users[st.session_state.current_user_id-1]['name']}")
+                # Notify admins (one broadcast, whatever the number of admins)
+                add_role_notification("admin", "admin_redemption",
+                                      f"New redemption request from {get_user(st.session_state.current_user_id)['name']}")
                 
                 st.success("✅ Redemption request submitted! HR will process it soon.")
                 st.balloons()
@@ -862,29 +2770,17 @@ def render_employee_badges():
     """Render earned badges for employee"""
     st.markdown("### 🏆 My Badges")
     
-    user_badge_ids = [b["badge_id"] for b in st.session_state.user_badges 
-                     if b["user_id"] == st.session_state.current_user_id]
+    user_badge_ids = [b["badge_id"] for b in get_store().query(
+        "SELECT badge_id FROM user_badges WHERE user_id = ?", (st.session_state.current_user_id,)
+    )]
     
     earned_badges = [b for b in BADGES if b["id"] in user_badge_ids]
     locked_badges = [b for b in BADGES if b["id"] not in user_badge_ids]
     
     if earned_badges:
         st.markdown("#### ✅ Earned Badges")
-        cols = st.columns(4)
-        for i, badge in enumerate(earned_badges):
-            with cols[i % 4]:
-                st.markdown(f"""
-                    <div style="background: rgba(74, 222, 128, 0.2); border: 2px solid #4ade80;
-                                border-radius: 16px; padding: 20px; text-align: center; margin-bottom: 16px;">
-                        <div style="font-size: 48px; margin-bottom: 8px;">{badge['icon']}</div>
-                        <div style="font-size: 16px; font-weight: 700; color: white;">
-                            {badge['name']}
-                        </div>
-                        <div style="font-size: 12px; color: #94a3b8; margin-top: 4px;">
-                            {badge['criteria']}
-                        </div>
-                    </div>
-                """, unsafe_allow_html=True)
+        render_card_grid("badge", [{**badge, "state": "earned"} for badge in earned_badges],
+                         columns="repeat(4, 1fr)")
     else:
         st.info("No badges earned yet. Complete activities to unlock badges!")
     
@@ -892,22 +2788,8 @@ def render_employee_badges():
     
     if locked_badges:
         st.markdown("#### 🔒 Locked Badges")
-        cols = st.columns(4)
-        for i, badge in enumerate(locked_badges):
-            with cols[i % 4]:
-                st.markdown(f"""
-                    <div style="background: rgba(100, 116, 139, 0.2); border: 2px solid #64748b;
-                                border-radius: 16px; padding: 20px; text-align: center; margin-bottom: 16px;
-                                opacity: 0.6;">
-                        <div style="font-size: 48px; margin-bottom: 8px; filter: grayscale(100%);">{badge['icon']}</div>
-                        <div style="font-size: 16px; font-weight: 700; color: #94a3b8;">
-                            {badge['name']}
-                        </div>
-                        <div style="font-size: 12px; color: #64748b; margin-top: 4px;">
-                            {badge['criteria']}
-                        </div>
-                    </div>
-                """, unsafe_allow_html=True)
+        render_card_grid("badge", [{**badge, "state": "locked"} for badge in locked_badges],
+                         columns="repeat(4, 1fr)")
 
 # ==============================================================================
 # SECTION 5: UI RENDERING FUNCTIONS - ORGANIZATION DASHBOARD
@@ -930,31 +2812,29 @@ def render_organization_dashboard():
     """, unsafe_allow_html=True)
     
     # Check if user is admin
-    current_user = next(u for u in st.session_state.users if u["id"] == st.session_state.current_user_id)
+    current_user = get_user(st.session_state.current_user_id)
     is_admin = current_user["role"] == "admin"
     
-    # Tabs
+    # Sections (only the selected one is computed)
+    sections = {
+        "📈 Analytics": render_org_analytics,
+        "🏆 Leaderboard": render_org_leaderboard,
+    }
     if is_admin:
-        tabs = st.tabs(["📈 Analytics", "🏆 Leaderboard", "⚙️ Activity Management"])
-    else:
-        tabs = st.tabs(["📈 Analytics", "🏆 Leaderboard"])
-    
-    with tabs[0]:  # Analytics
-        render_org_analytics()
-    
-    with tabs[1]:  # Leaderboard
-        render_org_leaderboard()
-    
-    if is_admin and len(tabs) > 2:
-        with tabs[2]:  # Activity Management
-            render_activity_management()
+        sections["⚙️ Activity Management"] = render_activity_management
+    render_sections(sections, key="org_section")
 
 def render_org_analytics():
     """Render organization analytics section"""
+    analytics = get_org_analytics()
+    chart_version = (get_store().version(LEDGER_TABLES), tuple(LEVEL_THRESHOLDS))  # same key as the analytics
+    
     # Key metrics
-    total_users = len([u for u in st.session_state.users if u["role"] == "user"])
-    total_points_distributed = sum(p["points"] for p in st.session_state.points_ledger if p["status"] == "approved")
-    total_redemptions = len([r for r in st.session_state.redemption_requests if r["status"] == "approved"])
+    total_users = analytics["total_users"]
+    total_points_distributed = analytics["total_points"]
+    total_redemptions = get_store().scalar(
+        "SELECT COUNT(*) FROM redemption_requests WHERE status = 'approved'"
+    )
     avg_points_per_user = total_points_distributed / total_users if total_users > 0 else 0
     
     cols = st.columns(4)
@@ -986,18 +2866,13 @@ def render_org_analytics():
     
     with col1:
         # Points by department
-        dept_points = {}
-        for user in st.session_state.users:
-            if user["role"] == "user":
-                points = get_user_total_points(user["id"])
-                dept = user["department"]
-                dept_points[dept] = dept_points.get(dept, 0) + points
-        
-        if dept_points and len(dept_points) > 0:
-            try:
+        dept_points = analytics["dept_points"]
+        
+        if len(dept_points) > 0:
+            def build_dept():
                 fig_dept = go.Figure(data=[go.Bar(
-                    x=list(dept_points.keys()),
-                    y=list(dept_points.values()),
+                    x=dept_points.index.tolist(),
+                    y=dept_points.tolist(),
                     marker=dict(color='#3b82f6')
                 )])
                 fig_dept.update_layout(
@@ -1009,6 +2884,10 @@ def render_org_analytics():
                     xaxis=dict(title="Department"),
                     yaxis=dict(title="Total Points")
                 )
+                return fig_dept
+            
+            try:
+                fig_dept = get_figure("department_points", "org", chart_version, build_dept)
                 st.plotly_chart(fig_dept, use_container_width=True)
             except Exception as e:
                 st.info("Unable to display department chart")
@@ -1017,19 +2896,13 @@ def render_org_analytics():
     
     with col2:
         # Level distribution
-        level_dist = {}
-        for user in st.session_state.users:
-            if user["role"] == "user":
-                points = get_user_total_points(user["id"])
-                level = get_user_level(points)
-                level_name = level["name"]
-                level_dist[level_name] = level_dist.get(level_name, 0) + 1
-        
-        if level_dist and len(level_dist) > 0:
-            try:
+        level_dist = analytics["level_counts"]
+        
+        if len(level_dist) > 0:
+            def build_levels():
                 fig_levels = go.Figure(data=[go.Pie(
-                    labels=list(level_dist.keys()),
-                    values=list(level_dist.values()),
+                    labels=level_dist.index.tolist(),
+                    values=level_dist.tolist(),
                     hole=0.4,
                     marker=dict(colors=['#cd7f32', '#c0c0c0', '#ffd700', '#e5e4e2', '#4169e1', '#9966cc'])
                 )])
@@ -1041,6 +2914,10 @@ def render_org_analytics():
                     height=350,
                     showlegend=True
                 )
+                return fig_levels
+            
+            try:
+                fig_levels = get_figure("level_distribution", "org", chart_version, build_levels)
                 st.plotly_chart(fig_levels, use_container_width=True)
             except Exception as e:
                 st.info("Unable to display level distribution chart")
@@ -1050,7 +2927,17 @@ def render_org_analytics():
 def render_org_leaderboard():
     """Render organization leaderboard"""
     st.markdown("### 🏆 Company Leaderboard")
-    leaderboard_df = generate_leaderboard()
+    viewer_id = st.session_state.current_user_id
+    with get_store().lock:  # the shared index is updated in place by other sessions' writes
+        rank_index = get_balance_rank_index()
+        ranked_count = len(rank_index)
+        viewer_rank = rank_index.rank(viewer_id) if viewer_id in rank_index else None
+    if not ranked_count:
+        st.info("No employees to rank yet")
+        return
+    
+    start_rank, page_size = render_rank_pager(ranked_count, viewer_rank, key="org_leaderboard")
+    leaderboard_df = generate_leaderboard(page_size, start_rank)
     
     # Style the dataframe
     st.dataframe(
@@ -1251,74 +3138,25 @@ def render_activity_management():
             with st.expander(f"📌 {cat_name}", expanded=False):
                 for rule in rules:
                     if rule in SCORING_RULES:
-                        col1, col2, col3 = st.columns([3, 2, 1])
-                        
-                        with col1:
-                            st.write(f"**{rule.replace('_', ' ').title()}**")
-                        
-                        with col2:
-                            # Get current value
-                            current_value = st.session_state.custom_scoring_rules.get(rule, SCORING_RULES[rule])
-                            
-                            new_value = st.number_input(
-                                "Points",
-                                min_value=1,
-                                max_value=5000,
-                                value=int(current_value),
-                                key=f"score_{rule}",
-                                label_visibility="collapsed"
-                            )
-                        
-                        with col3:
-                            if st.button("Update", key=f"update_{rule}", use_container_width=True):
-                                st.session_state.custom_scoring_rules[rule] = new_value
-                                
-                                # Add audit log
-                                add_audit_log(
-                                    st.session_state.current_user_id,
-                                    "updated_scoring_rule",
-                                    f"Updated {rule}: {SCORING_RULES[rule]} → {new_value} points"
-                                )
-                                
-                                st.success(f"✅ Updated {rule} to {new_value} points")
-                                st.rerun()
+                        render_scoring_rule_editor(rule)
         
         # Custom activities scoring
         if st.session_state.custom_scoring_rules:
             st.markdown("---")
             st.markdown("#### Custom Activity Scoring")
             
-            for key, value in st.session_state.custom_scoring_rules.items():
+            for key in list(st.session_state.custom_scoring_rules):
                 if key.startswith("custom_"):
-                    col1, col2, col3 = st.columns([3, 2, 1])
-                    
-                    with col1:
-                        st.write(f"**{key.replace('custom_', '').replace('_', ' ').title()}**")
-                    
-                    with col2:
-                        new_value = st.number_input(
-                            "Points",
-                            min_value=1,
-                            max_value=5000,
-                            value=int(value),
-                            key=f"custom_score_{key}",
-                            label_visibility="collapsed"
-                        )
-                    
-                    with col3:
-                        if st.button("Update", key=f"update_custom_{key}", use_container_width=True):
-                            st.session_state.custom_scoring_rules[key] = new_value
-                            st.success(f"✅ Updated to {new_value} points")
-                            st.rerun()
+                    render_scoring_rule_editor(key)
 
 # Keep the rest of organization dashboard
     st.markdown("### 📈 Recent Activity")
-    recent_points = sorted(st.session_state.points_ledger, key=lambda x: x["date"], reverse=True)[:20]
+    recent_points = get_store().query("SELECT * FROM points_ledger ORDER BY date DESC LIMIT 20")
     
     if recent_points:
         activity_data = []
         for point in recent_points:
-            user = next(u for u in st.session_state.users if u["id"] == point["user_id"])
+            user = get_user(point["user_id"])
             activity_data.append({
                 "Date": point["date"],
                 "Employee": user["name"],
@@ -1351,22 +3189,14 @@ def render_admin_dashboard():
         </div>
     """, unsafe_allow_html=True)
     
-    tabs = st.tabs(["🔔 Pending Requests", "👥 All Employees", "➕ Add Points", "⚙️ Manage Items", "📋 Audit Log"])
-    
-    with tabs[0]:  # Pending Requests
-        render_admin_pending_requests()
-    
-    with tabs[1]:  # All Employees
-        render_admin_all_employees()
-    
-    with tabs[2]:  # Add Points
-        render_admin_add_points()
-    
-    with tabs[3]:  # Manage Items
-        render_admin_manage_items()
-    
-    with tabs[4]:  # Audit Log
-        render_admin_audit_log()
+    # Sections (only the selected one is computed)
+    render_sections({
+        "🔔 Pending Requests": render_admin_pending_requests,
+        "👥 All Employees": render_admin_all_employees,
+        "➕ Add Points": render_admin_add_points,
+        "⚙️ Manage Items": render_admin_manage_items,
+        "📋 Audit Log": render_admin_audit_log,
+    }, key="admin_section")
 
 def render_admin_manage_items():
     """Comprehensive admin interface to manage all system items"""
@@ -1470,6 +3300,7 @@ def render_admin_manage_items():
                                             activity['points_value'] = new_points
                                             activity['category'] = new_category
                                             activity['is_active'] = new_active
+                                            rebuild_catalog_indexes()
                                             
                                             add_audit_log(
                                                 st.session_state.current_user_id,
@@ -1525,32 +3356,7 @@ def render_admin_manage_items():
             with st.expander(f"{cat_name} ({len(rules)} rules)", expanded=False):
                 for rule in rules:
                     if rule in SCORING_RULES:
-                        col1, col2, col3 = st.columns([2, 1, 1])
-                        
-                        with col1:
-                            st.write(f"**{rule.replace('_', ' ').title()}**")
-                        
-                        with col2:
-                            current_value = st.session_state.custom_scoring_rules.get(rule, SCORING_RULES[rule])
-                            new_value = st.number_input(
-                                "Points",
-                                min_value=1,
-                                max_value=10000,
-                                value=int(current_value),
-                                key=f"admin_score_{rule}",
-                                label_visibility="collapsed"
-                            )
-                        
-                        with col3:
-                            if st.button("💾 Update", key=f"admin_upd_{rule}", use_container_width=True):
-                                st.session_state.custom_scoring_rules[rule] = new_value
-                                add_audit_log(
-                                    st.session_state.current_user_id,
-                                    "updated_scoring",
-                                    f"Updated {rule}: {SCORING_RULES[rule]} → {new_value} pts"
-                                )
-                                st.success(f"✅ Updated to {new_value} points")
-                                st.rerun()
+                        render_scoring_rule_editor(rule)
     
     with item_tabs[2]:  # Redemptions
         st.markdown("#### 🎁 Redemption Options")
@@ -1608,6 +3414,7 @@ def render_admin_manage_items():
                                         item['description'] = new_desc
                                         item['points'] = new_points
                                         item['value'] = new_value
+                                        rebuild_catalog_indexes()
                                         
                                         add_audit_log(
                                             st.session_state.current_user_id,
@@ -1685,6 +3492,7 @@ def render_admin_manage_items():
                         if st.form_submit_button("💾 Save", use_container_width=True):
                             level['points_min'] = new_min
                             level['points_max'] = new_max
+                            rebuild_level_thresholds()
                             
                             add_audit_log(
                                 st.session_state.current_user_id,
@@ -1775,104 +3583,245 @@ def render_admin_manage_items():
             
             st.markdown("---")
 
+@st.fragment
+def render_scoring_rule_editor(rule: str):
+    """Render one scoring rule row (system or custom activity) with its own update button
+
+    Updates rerun only the row.
+    """
+    col1, col2, col3 = st.columns([2, 1, 1])
+    
+    # Custom activities have no system default; their rule key carries a custom_ prefix
+    default_value = SCORING_RULES.get(rule, st.session_state.custom_scoring_rules.get(rule))
+    
+    with col1:
+        st.write(f"**{rule.removeprefix('custom_').replace('_', ' ').title()}**")
+    
+    with col2:
+        current_value = st.session_state.custom_scoring_rules.get(rule, default_value)
+        new_value = st.number_input(
+            "Points",
+            min_value=1,
+            max_value=10000,
+            value=int(current_value),
+            key=f"admin_score_{rule}",
+            label_visibility="collapsed"
+        )
+    
+    with col3:
+        if st.button("💾 Update", key=f"admin_upd_{rule}", use_container_width=True):
+            st.session_state.custom_scoring_rules[rule] = new_value
+            add_audit_log(
+                st.session_state.current_user_id,
+                "updated_scoring",
+                f"Updated {rule}: {default_value} → {new_value} pts"
+            )
+            st.success(f"✅ Updated to {new_value} points")
+
+def render_batch_reward_actions(page_rows: List[Dict], filters: Dict, total: int):
+    """Render multi-select approve/reject for the pending reward queue"""
+    labels = {req["id"]: f"#{req['id']} - {req['name']} - {req['points_requested']} pts" for req in page_rows}
+    
+    def run_batch(action: str):
+        # Full request rows are only loaded here, for the requests being processed
+        if st.session_state.batch_select_all:
+            selected = get_pending_rewards(filters=filters)
+        else:
+            selected = get_pending_rewards(request_ids=st.session_state.batch_reward_ids)
+        if action == "approve":
+            handled = approve_reward_requests(selected, st.session_state.current_user_id)
+            result = (f"✅ Approved {len(handled)} request(s) - "
+                      f"{sum(req['points_requested'] for req in handled):,} points "
+                      f"for {len({req['user_id'] for req in handled})} employee(s)")
+        else:
+            handled = reject_reward_requests(selected, st.session_state.current_user_id)
+            result = f"Rejected {len(handled)} request(s)"
+        if len(handled) < len(selected):
+            result += f" - {len(selected) - len(handled)} already handled by another reviewer"
+        st.session_state.batch_reward_result = result
+        st.session_state.batch_reward_ids = []
+        st.session_state.batch_select_all = False
+    
+    # Drop selections that are not on this page (paged away, or approved meanwhile)
+    if "batch_reward_ids" in st.session_state:
+        st.session_state.batch_reward_ids = [i for i in st.session_state.batch_reward_ids if i in labels]
+    
+    with st.container(border=True):
+        st.markdown("**Batch actions**")
+        select_all = st.checkbox(f"Select all {total:,} matching requests", key="batch_select_all")
+        if select_all:
+            selected_count = total
+        else:
+            selected_count = len(st.multiselect(
+                "Select requests on this page", options=list(labels), format_func=labels.get,
+                key="batch_reward_ids", placeholder="Choose requests to approve or reject together"
+            ))
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button(f"✅ Approve Selected ({selected_count:,})", key="batch_approve_rewards",
+                      type="primary", use_container_width=True, disabled=selected_count == 0,
+                      on_click=run_batch, args=("approve",))
+        with col2:
+            st.button(f"❌ Reject Selected ({selected_count:,})", key="batch_reject_rewards",
+                      use_container_width=True, disabled=selected_count == 0,
+                      on_click=run_batch, args=("reject",))
+
+def render_pending_reward_filters() -> Tuple[Dict, str]:
+    """Render the pending queue filters and return (filters, sort order)"""
+    store = get_store()
+    departments = [row["department"] for row in store.query(
+        "SELECT DISTINCT department FROM users WHERE role = 'user' ORDER BY department"
+    )]
+    categories = [row["category"] for row in store.query(
+        "SELECT DISTINCT category FROM reward_requests WHERE status = 'pending' ORDER BY category"
+    )]
+    max_points = store.scalar(
+        "SELECT COALESCE(MAX(points_requested), 0) FROM reward_requests WHERE status = 'pending'"
+    )
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        department = st.selectbox("Department", ["All"] + departments, key="pending_department")
+    with col2:
+        category = st.selectbox("Category", ["All"] + categories, key="pending_category")
+    with col3:
+        age = st.selectbox("Age", list(PENDING_AGE_FILTERS), key="pending_age")
+    with col4:
+        sort = st.selectbox("Sort by", list(PENDING_SORTS), key="pending_sort")
+    
+    filters = {
+        "department": None if department == "All" else department,
+        "category": None if category == "All" else category,
+        "min_age_days": PENDING_AGE_FILTERS[age],
+    }
+    if max_points > 0:
+        points_range = st.slider("Points requested", 0, max_points, (0, max_points), key="pending_points")
+        if points_range != (0, max_points):
+            filters["points_range"] = points_range
+    return filters, sort
+
 def render_admin_pending_requests():
     """Render pending reward and redemption requests with approve/reject actions"""
     st.markdown("### 🔔 Pending Requests")
     
     # Reward requests
     st.markdown("#### 💰 Reward Point Requests")
-    pending_rewards = [r for r in st.session_state.reward_requests if r["status"] == "pending"]
+    render_pending_reward_queue()
     
-    if pending_rewards:
-        for req in pending_rewards:
-            user = next(u for u in st.session_state.users if u["id"] == req["user_id"])
-            
-            with st.expander(f"Request #{req['id']} - {user['name']} - {req['points_requested']} pts"):
-                col1, col2, col3 = st.columns([2, 2, 1])
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Redemption requests
+    st.markdown("#### 🎁 Redemption Requests")
+    render_pending_redemption_queue()
+
+@st.fragment
+def render_pending_reward_queue():
+    """Render the filtered, paged reward queue (reruns on its own when a request is handled)"""
+    def review(req: Dict, action: str):
+        if action == "approve":
+            handled = approve_reward_requests(get_pending_rewards([req["id"]]), st.session_state.current_user_id)
+            result = f"✅ Approved {req['points_requested']} points for {req['name']}"
+        else:
+            handled = reject_reward_requests(get_pending_rewards([req["id"]]), st.session_state.current_user_id)
+            result = f"Rejected request #{req['id']} from {req['name']}"
+        st.session_state.batch_reward_result = (
+            result if handled else f"Request #{req['id']} was already handled by another reviewer"
+        )
+    
+    if "batch_reward_result" in st.session_state:
+        st.success(st.session_state.pop("batch_reward_result"))
+    
+    filters, sort = render_pending_reward_filters()
+    total = count_pending_rewards(filters)
+    
+    if total:
+        start_rank, page_size = render_rank_pager(total, None, key="pending_rewards", page_sizes=PENDING_PAGE_SIZES)
+        page_rows = query_pending_rewards(filters, sort, page_size, start_rank - 1)
+        render_batch_reward_actions(page_rows, filters, total)
+        
+        for req in page_rows:
+            with st.container(border=True):
+                col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
                 
                 with col1:
-                    st.write(f"**Employee:** {user['name']} ({user['department']})")
-                    st.write(f"**Activity:** {req['earn_type']}")
-                    st.write(f"**Category:** {req['category']}")
-                    st.write(f"**Points Requested:** {req['points_requested']:,}")
+                    st.markdown(f"**#{req['id']} · {req['name']}** ({req['department']})  \n"
+                                f"{req['earn_type']} · {req['category']}")
                 
                 with col2:
-                    st.write(f"**Description:** {req['description']}")
-                    st.write(f"**Justification:** {req['justification']}")
-                    st.write(f"**Evidence:** {req.get('attachment_desc', 'N/A')}")
-                    st.write(f"**Submitted:** {req['date_submitted']}")
+                    st.markdown(f"**{req['points_requested']:,} pts**  \nSubmitted {req['date_submitted']}")
                 
                 with col3:
-                    if st.button(f"✅ Approve", key=f"approve_reward_{req['id']}", type="primary", use_container_width=True):
-                        # Approve request
-                        req["status"] = "approved"
-                        req["approved_by"] = st.session_state.current_user_id
-                        req["approved_date"] = datetime.now().strftime("%Y-%m-%d")
-                        
-                        # Add points to ledger
-                        new_points = {
-                            "id": st.session_state.next_points_id,
-                            "user_id": req["user_id"],
-                            "points": req["points_requested"],
-                            "category": req["category"],
-                            "description": req["description"],
-                            "date": req["date_submitted"],
-                            "status": "approved",
-                            "approved_by": st.session_state.current_user_id,
-                            "approved_date": datetime.now().strftime("%Y-%m-%d")
-                        }
-                        st.session_state.points_ledger.append(new_points)
-                        st.session_state.next_points_id += 1
-                        
-                        # Check and award badges
-                        check_and_award_badges(req["user_id"])
-                        
-                        # Check level up
-                        old_level = get_user_level(get_user_total_points(req["user_id"]) - req["points_requested"])
-                        new_level = get_user_level(get_user_total_points(req["user_id"]))
-                        if new_level["id"] > old_level["id"]:
-                            add_notification(req["user_id"], "level_up", 
-                                           f"🎉 Congratulations! You've reached {new_level['name']} level!")
-                        
-                        # Notify user
-                        add_notification(req["user_id"], "points_earned",
-                                       f"✅ Your request for {req['points_requested']} points has been approved!")
-                        
-                        # Audit log
-                        add_audit_log(st.session_state.current_user_id, "approved_reward_request",
-                                    f"Approved {req['points_requested']} points for {user['name']}")
-                        
-                        st.success(f"✅ Approved {req['points_requested']} points for {user['name']}")
-                        st.rerun()
-                    
-                    if st.button(f"❌ Reject", key=f"reject_reward_{req['id']}", use_container_width=True):
-                        req["status"] = "rejected"
-                        req["reviewed_by"] = st.session_state.current_user_id
-                        req["reviewed_date"] = datetime.now().strftime("%Y-%m-%d")
-                        
-                        # Notify user
-                        add_notification(req["user_id"], "request_rejected",
-                                       f"❌ Your request for {req['points_requested']} points has been rejected. Contact HR for details.")
-                        
-                        # Audit log
-                        add_audit_log(st.session_state.current_user_id, "rejected_reward_request",
-                                    f"Rejected request from {user['name']}")
-                        
-                        st.warning(f"Request rejected")
-                        st.rerun()
+                    st.button(f"✅ Approve", key=f"approve_reward_{req['id']}", type="primary",
+                              use_container_width=True, on_click=review, args=(req, "approve"))
+                
+                with col4:
+                    st.button(f"❌ Reject", key=f"reject_reward_{req['id']}", use_container_width=True,
+                              on_click=review, args=(req, "reject"))
+                
+                # Details are only queried for requests the reviewer opens
+                if st.toggle("🔍 Details", key=f"details_reward_{req['id']}"):
+                    details = get_store().query_one(
+                        "SELECT description, justification, attachment_desc FROM reward_requests WHERE id = ?",
+                        (req["id"],)
+                    )
+                    st.write(f"**Description:** {details['description']}")
+                    st.write(f"**Justification:** {details['justification'] or 'N/A'}")
+                    st.write(f"**Evidence:** {details['attachment_desc'] or 'N/A'}")
     else:
-        st.info("No pending reward requests")
+        st.info("No pending reward requests match these filters")
+
+@st.fragment
+def render_pending_redemption_queue():
+    """Render pending redemptions (reruns on its own when one is approved or rejected)"""
+    def review(req: Dict, user: Dict, action: str):
+        store = get_store()
+        with store.transaction():
+            if action == "approve":
+                done = approve_redemption(req, st.session_state.current_user_id)
+                if done:
+                    add_notification(req["user_id"], "redemption_approved",
+                                     f"✅ Your redemption of {req['redemption_name']} has been approved!")
+                    add_audit_log(st.session_state.current_user_id, "approved_redemption",
+                                  f"Approved {req['redemption_name']} redemption for {user['name']}")
+            else:
+                done = store.update(
+                    "redemption_requests", req["id"],
+                    where={"status": "pending"},
+                    status="rejected",
+                    reviewed_by=st.session_state.current_user_id,
+                    reviewed_date=datetime.now().strftime("%Y-%m-%d")
+                )
+                if done:
+                    add_notification(req["user_id"], "redemption_rejected",
+                                     f"❌ Your redemption request has been rejected. Contact HR for details.")
+                    add_audit_log(st.session_state.current_user_id, "rejected_redemption",
+                                  f"Rejected redemption from {user['name']}")
+            still_pending = not done and store.scalar(
+                "SELECT status FROM redemption_requests WHERE id = ?", (req["id"],)
+            ) == "pending"
+        if done:
+            st.session_state.redemption_result = ("success",
+                f"✅ Approved redemption for {user['name']}" if action == "approve"
+                else f"Rejected redemption #{req['id']} from {user['name']}")
+        elif still_pending:
+            st.session_state.redemption_result = ("warning",
+                f"⚠️ {user['name']} no longer has enough points for redemption #{req['id']}")
+        else:
+            st.session_state.redemption_result = ("warning",
+                f"Redemption #{req['id']} was already handled by another reviewer")
     
-    st.markdown("<br>", unsafe_allow_html=True)
+    if "redemption_result" in st.session_state:
+        kind, message = st.session_state.pop("redemption_result")
+        getattr(st, kind)(message)
     
-    # Redemption requests
-    st.markdown("#### 🎁 Redemption Requests")
-    pending_redemptions = [r for r in st.session_state.redemption_requests if r["status"] == "pending"]
+    pending_redemptions = get_store().query("SELECT * FROM redemption_requests WHERE status = 'pending' ORDER BY id")
     
     if pending_redemptions:
+        balances = get_user_balances(list({req["user_id"] for req in pending_redemptions}))
         for req in pending_redemptions:
-            user = next(u for u in st.session_state.users if u["id"] == req["user_id"])
-            user_points = get_user_total_points(req["user_id"])
+            user = get_user(req["user_id"])
+            user_points = balances.get(req["user_id"], 0)
             can_afford = user_points >= req["points_cost"]
             
             with st.expander(f"Redemption #{req['id']} - {user['name']} - {req['redemption_name']}"):
@@ -1886,84 +3835,96 @@ def render_admin_pending_requests():
                 
                 with col2:
                     st.write(f"**Submitted:** {req['date_submitted']}")
-                    st.write(f"**Notes:** {req.get('notes', 'N/A')}")
+                    st.write(f"**Notes:** {req.get('notes') or 'N/A'}")
                     if not can_afford:
                         st.error(f"⚠️ Insufficient points! Needs {req['points_cost'] - user_points:,} more")
                 
                 with col3:
                     if can_afford:
-                        if st.button(f"✅ Approve", key=f"approve_redemption_{req['id']}", type="primary", use_container_width=True):
-                            req["status"] = "approved"
-                            req["approved_by"] = st.session_state.current_user_id
-                            req["approved_date"] = datetime.now().strftime("%Y-%m-%d")
-                            req["fulfillment_status"] = "processing"
-                            
-                            # Notify user
-                            add_notification(req["user_id"], "redemption_approved",
-                                           f"✅ Your redemption of {req['redemption_name']} has been approved!")
-                            
-                            # Audit log
-                            add_audit_log(st.session_state.current_user_id, "approved_redemption",
-                                        f"Approved {req['redemption_name']} redemption for {user['name']}")
-                            
-                            st.success(f"✅ Approved redemption for {user['name']}")
-                            st.rerun()
-                        
-                        if st.button(f"❌ Reject", key=f"reject_redemption_{req['id']}", use_container_width=True):
-                            req["status"] = "rejected"
-                            req["reviewed_by"] = st.session_state.current_user_id
-                            req["reviewed_date"] = datetime.now().strftime("%Y-%m-%d")
-                            
-                            # Notify user
-                            add_notification(req["user_id"], "redemption_rejected",
-                                           f"❌ Your redemption request has been rejected. Contact HR for details.")
-                            
-                            # Audit log
-                            add_audit_log(st.session_state.current_user_id, "rejected_redemption",
-                                        f"Rejected redemption from {user['name']}")
-                            
-                            st.warning("Request rejected")
-                            st.rerun()
+                        st.button(f"✅ Approve", key=f"approve_redemption_{req['id']}", type="primary",
+                                  use_container_width=True, on_click=review, args=(req, user, "approve"))
+                        st.button(f"❌ Reject", key=f"reject_redemption_{req['id']}", use_container_width=True,
+                                  on_click=review, args=(req, user, "reject"))
                     else:
                         st.error("Cannot approve - insufficient points")
     else:
         st.info("No pending redemption requests")
 
+def render_export_controls(kind: str, make_chunks):
+    """Render format choice, a background export button and the recent export jobs of one kind"""
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        fmt = st.radio("Export format", EXPORT_FORMATS, horizontal=True, key=f"{kind}_export_format")
+    with col2:
+        if st.button("📥 Export", key=f"{kind}_export", use_container_width=True):
+            get_export_jobs().submit(kind, fmt, make_chunks, st.session_state.current_user_id)
+    with col3:
+        st.button("🔄 Refresh", key=f"{kind}_export_refresh", use_container_width=True)
+    
+    for job in get_export_jobs().list(kind)[:5]:
+        file_name = os.path.basename(job["path"])
+        if job["status"] == "done":
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.caption(f"✅ {file_name} - {job['rows']:,} rows")
+            with col2:
+                # a callable is only read when the button is clicked, not on every rerun
+                st.download_button("Download", data=lambda path=job["path"]: read_export_file(path),
+                                   file_name=file_name, key=f"download_{job['id']}",
+                                   mime="text/csv" if job["format"] == "CSV" else "application/octet-stream")
+        elif job["status"] == "failed":
+            st.caption(f"❌ {file_name} - export failed: {job['error']}")
+        else:
+            st.caption(f"⏳ {file_name} - {job['status']} (started {job['started']})")
+
 def render_admin_all_employees():
     """Render view of all employees with their points"""
     st.markdown("### 👥 All Employees")
     
     employees_data = []
-    for user in st.session_state.users:
-        if user["role"] == "user":
-            total_points = get_user_total_points(user["id"])
-            level = get_user_level(total_points)
-            points_by_cat = get_points_by_category(user["id"])
-            
-            employees_data.append({
-                "ID": user["id"],
-                "Name": user["name"],
-                "Department": user["department"],
-                "Total Points": total_points,
-                "Level": f"{level['icon']} {level['name']}",
-                "Training": points_by_cat.get("training", 0),
-                "Innovation": points_by_cat.get("innovation", 0),
-                "Events": points_by_cat.get("events", 0),
-                "Performance": points_by_cat.get("performance", 0)
-            })
+    balances = get_user_balances()
+    category_totals = get_all_points_by_category()
+    employees = [user for user in get_users() if user["role"] == "user"]
+    level_ids = get_level_ids([balances.get(user["id"], 0) for user in employees])
+    for user, level_id in zip(employees, level_ids):
+        total_points = balances.get(user["id"], 0)
+        level = LEVELS[level_id - 1]
+        points_by_cat = category_totals.get(user["id"], {})
+        
+        employees_data.append({
+            "ID": user["id"],
+            "Name": user["name"],
+            "Department": user["department"],
+            "Total Points": total_points,
+            "Level": f"{level['icon']} {level['name']}",
+            "Training": points_by_cat.get("training", 0),
+            "Innovation": points_by_cat.get("innovation", 0),
+            "Events": points_by_cat.get("events", 0),
+            "Performance": points_by_cat.get("performance", 0)
+        })
     
     df_employees = pd.DataFrame(employees_data)
     st.dataframe(df_employees, use_container_width=True, hide_index=True, height=500)
     
-    # Export option
-    if st.button("📥 Export to CSV"):
-        csv = df_employees.to_csv(index=False)
-        st.download_button(
-            label="Download CSV",
-            data=csv,
-            file_name=f"employees_points_{datetime.now().strftime('%Y%m%d')}.csv",
-            mime="text/csv"
-        )
+    # Export option - streamed from the store by a background job
+    store = get_store()
+    render_export_controls("employees_points", lambda: iter_employee_export(store))
+
+    # Balance consistency check
+    with st.expander("🔍 Balance Consistency Check"):
+        st.caption("Compares the maintained balance, category, daily and duplicate-claim tables against the raw points ledger, redemptions and pending requests.")
+        if st.button("Verify & Repair Balances", key="verify_balances"):
+            mismatches = (verify_user_balances(get_store(), repair=True)
+                          + verify_category_totals(get_store(), repair=True)
+                          + verify_daily_points(get_store(), repair=True)
+                          + verify_claim_keys(get_store(), repair=True))
+            if mismatches:
+                st.warning(f"Rebuilt derived totals - {len(mismatches)} row(s) were out of sync")
+                st.dataframe(pd.DataFrame(mismatches), use_container_width=True, hide_index=True)
+                add_audit_log(st.session_state.current_user_id, "rebuilt_balances",
+                            f"Rebuilt derived totals ({len(mismatches)} row(s) out of sync)")
+            else:
+                st.success("✅ All balances match the ledger")
 
 def render_admin_add_points():
     """Render form for admin to manually add points"""
@@ -1973,9 +3934,9 @@ def render_admin_add_points():
     col1, col2 = st.columns(2)
     
     with col1:
-        user_names = [u["name"] for u in st.session_state.users if u["role"] == "user"]
+        user_names = [u["name"] for u in get_users() if u["role"] == "user"]
         selected_user_name = st.selectbox("Select Employee", user_names)
-        selected_user = next(u for u in st.session_state.users if u["name"] == selected_user_name)
+        selected_user = get_user_by_name(selected_user_name)
         
         points_to_add = st.number_input("Points to Award", min_value=10, max_value=5000, value=100, step=10)
         
@@ -1994,33 +3955,24 @@ def render_admin_add_points():
         if not reason:
             st.error("Please provide a reason for awarding points")
         else:
-            # Add to points ledger
-            new_points = {
-                "id": st.session_state.next_points_id,
-                "user_id": selected_user["id"],
-                "points": points_to_add,
-                "category": category,
-                "description": f"Manual award: {reason}",
-                "date": date_awarded.strftime("%Y-%m-%d"),
-                "status": "approved",
-                "approved_by": st.session_state.current_user_id,
-                "approved_date": datetime.now().strftime("%Y-%m-%d")
-            }
-            st.session_state.points_ledger.append(new_points)
-            st.session_state.next_points_id += 1
-            
-            # Check badges
-            check_and_award_badges(selected_user["id"])
-            
-            # Check level up
-            total_points = get_user_total_points(selected_user["id"])
-            level = get_user_level(total_points)
-            add_notification(selected_user["id"], "level_up",
-                           f"🎉 Admin awarded you {points_to_add} points! Current level: {level['name']}")
-            
-            # Audit log
-            add_audit_log(st.session_state.current_user_id, "manual_points_added",
-                        f"Added {points_to_add} points to {selected_user['name']} - {reason}")
+            with get_store().transaction():
+                # Add to points ledger
+                add_points_entry(selected_user["id"], points_to_add, category,
+                                 f"Manual award: {reason}", date_awarded.strftime("%Y-%m-%d"),
+                                 st.session_state.current_user_id)
+                
+                # Check badges
+                check_and_award_badges(selected_user["id"])
+                
+                # Check level up
+                total_points = get_user_total_points(selected_user["id"])
+                level = get_user_level(total_points)
+                add_notification(selected_user["id"], "level_up",
+                               f"🎉 Admin awarded you {points_to_add} points! Current level: {level['name']}")
+                
+                # Audit log
+                add_audit_log(st.session_state.current_user_id, "manual_points_added",
+                            f"Added {points_to_add} points to {selected_user['name']} - {reason}")
             
             st.success(f"✅ Successfully awarded {points_to_add} points to {selected_user['name']}")
             st.balloons()
@@ -2031,34 +3983,47 @@ def render_admin_audit_log():
     st.markdown("Complete history of all admin actions and system events")
     
     # Filter options
+    store = get_store()
+    actions = [row["action"] for row in store.query("SELECT action FROM audit_actions ORDER BY action")]
+    actors = [get_user(row["user_id"]) for row in store.query("SELECT user_id FROM audit_users")]
+    actor_ids = {user["name"]: user["id"] for user in actors if user is not None}
+    
     col1, col2, col3 = st.columns(3)
     with col1:
-        filter_action = st.selectbox("Filter by Action", 
-                                     ["All"] + list(set([a["action"] for a in st.session_state.audit_log])))
+        filter_action = st.selectbox("Filter by Action", ["All"] + actions)
     with col2:
-        filter_user = st.selectbox("Filter by User",
-                                   ["All"] + [u["name"] for u in st.session_state.users])
+        filter_user = st.selectbox("Filter by User", ["All"] + sorted(actor_ids))
     with col3:
         days_back = st.number_input("Days Back", min_value=1, max_value=90, value=30)
     
-    # Filter audit log
-    filtered_log = st.session_state.audit_log.copy()
-    
-    if filter_action != "All":
-        filtered_log = [a for a in filtered_log if a["action"] == filter_action]
+    # Keyset pagination: a stack of (date, id) cursors, one per page visited. The
+    # window start is fixed when the filters change, so paging keeps the same bounds.
+    filter_key = (filter_action, filter_user, days_back)
+    if st.session_state.get("audit_filter_key") != filter_key:
+        st.session_state.audit_filter_key = filter_key
+        st.session_state.audit_cursors = [None]
+        # Same format as audit_log.date, so the window is exactly days_back x 24 hours
+        st.session_state.audit_since = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d %H:%M")
+    cursors = st.session_state.audit_cursors
+    
+    filters = {
+        "since": st.session_state.audit_since,
+        "action": None if filter_action == "All" else filter_action,
+        "user_id": actor_ids.get(filter_user),
+    }
     
-    if filter_user != "All":
-        user_id = next(u["id"] for u in st.session_state.users if u["name"] == filter_user)
-        filtered_log = [a for a in filtered_log if a["user_id"] == user_id]
+    page = query_audit_log(filters, AUDIT_PAGE_SIZE + 1, cursors[-1])
+    has_more = len(page) > AUDIT_PAGE_SIZE
+    page = page[:AUDIT_PAGE_SIZE]
     
     # Convert to dataframe
-    if filtered_log:
+    if page:
         audit_data = []
-        for entry in sorted(filtered_log, key=lambda x: x["date"], reverse=True):
-            user = next(u for u in st.session_state.users if u["id"] == entry["user_id"])
+        for entry in page:
+            user = get_user(entry["user_id"])
             audit_data.append({
                 "Date": entry["date"],
-                "User": user["name"],
+                "User": user["name"] if user else f"User #{entry['user_id']}",
                 "Action": entry["action"].replace("_", " ").title(),
                 "Details": entry["details"]
             })
@@ -2066,15 +4031,21 @@ def render_admin_audit_log():
         df_audit = pd.DataFrame(audit_data)
         st.dataframe(df_audit, use_container_width=True, hide_index=True, height=500)
         
-        # Export option
-        if st.button("📥 Export Audit Log"):
-            csv = df_audit.to_csv(index=False)
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name=f"audit_log_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
-            )
+        first = (len(cursors) - 1) * AUDIT_PAGE_SIZE + 1
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("◀ Newer", key="audit_newer", disabled=len(cursors) == 1, use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"Entries {first:,}-{first + len(page) - 1:,} from the last {days_back} day(s)")
+        with col3:
+            if st.button("Older ▶", key="audit_older", disabled=not has_more, use_container_width=True):
+                cursors.append((page[-1]["date"], page[-1]["id"]))
+                st.rerun()
+        
+        # Export option - every matching entry, streamed from the store by a background job
+        render_export_controls("audit_log", lambda: iter_audit_export(store, filters))
     else:
         st.info("No audit entries match the filters")
 
@@ -2138,24 +4109,7 @@ def render_badges_management():
     st.markdown("### 🎖️ Badge Definitions")
     
     # Display badges in a grid
-    cols = st.columns(3)
-    for i, badge in enumerate(BADGES):
-        with cols[i % 3]:
-            st.markdown(f"""
-                <div style="background: rgba(30, 41, 59, 0.6); border-radius: 16px; padding: 20px;
-                            border: 1px solid rgba(148, 163, 184, 0.2); margin-bottom: 16px;">
-                    <div style="font-size: 48px; text-align: center; margin-bottom: 12px;">{badge['icon']}</div>
-                    <div style="font-size: 18px; font-weight: 700; color: white; text-align: center; margin-bottom: 8px;">
-                        {badge['name']}
-                    </div>
-                    <div style="font-size: 13px; color: #94a3b8; text-align: center; margin-bottom: 12px;">
-                        {badge['criteria']}
-                    </div>
-                    <div style="font-size: 12px; color: #64748b; text-align: center;">
-                        Category: {badge['category']} | Threshold: {badge['points_threshold']}
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
+    render_card_grid("badge_definition", BADGES)
     
     st.info("ℹ️ Badge definitions are configured in the system constants. Contact system admin to modify.")
 
@@ -2184,27 +4138,7 @@ def render_redemptions_management():
     st.markdown("### 🎁 Redemption Options")
     
     # Display redemption options
-    cols = st.columns(3)
-    for i, option in enumerate(REDEMPTION_OPTIONS):
-        with cols[i % 3]:
-            st.markdown(f"""
-                <div style="background: rgba(30, 41, 59, 0.6); border-radius: 16px; padding: 20px;
-                            border: 1px solid rgba(148, 163, 184, 0.2); margin-bottom: 16px;">
-                    <div style="font-size: 48px; text-align: center; margin-bottom: 12px;">{option['icon']}</div>
-                    <div style="font-size: 18px; font-weight: 700; color: white; text-align: center; margin-bottom: 8px;">
-                        {option['name']}
-                    </div>
-                    <div style="font-size: 13px; color: #94a3b8; text-align: center; margin-bottom: 12px;">
-                        {option['description']}
-                    </div>
-                    <div style="font-size: 14px; color: #3b82f6; text-align: center; margin-bottom: 4px; font-weight: 700;">
-                        {option['points']:,} points
-                    </div>
-                    <div style="font-size: 12px; color: #64748b; text-align: center;">
-                        Value: {option['value']} | {option['category']}
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
+    render_card_grid("redemption_definition", REDEMPTION_OPTIONS)
     
     st.info("ℹ️ Redemption options are configured in the system constants. Contact system admin to modify.")
 
@@ -2272,7 +4206,7 @@ def render_leaderboards_page():
     with col2:
         department_filter = st.selectbox(
             "🏢 Department",
-            ["All Departments"] + list(set([u["department"] for u in st.session_state.users if u["role"] == "user"]))
+            ["All Departments"] + list(set([u["department"] for u in get_users() if u["role"] == "user"]))
         )
     
     with col3:
@@ -2305,142 +4239,96 @@ def render_leaderboards_page():
         period_label = "All Time"
     
     # Generate leaderboard with filters
-    leaderboard_data = []
+    # Per-user totals for the period: prefix-sum lookups, all-time straight from the balances
+    if time_period == "All Time":
+        period_totals = get_earned_totals()
+    else:
+        period_totals = get_period_points(start_date, end_date)
+    users_by_id = get_user_index()["by_id"]
+    
+    # Ranking index over the period points of employees in scope (admins excluded),
+    # plus the period statistics, cached until the next write
+    def build_period_rank() -> Tuple[RankIndex, Dict]:
+        scores = {
+            user["id"]: period_totals.get(user["id"], 0)
+            for user in users_by_id.values()
+            if user["role"] == "user"
+            and department_filter in ("All Departments", user["department"])
+        }
+        stats = {
+            "total": sum(scores.values()),
+            "max": max(scores.values(), default=0),
+            "active": sum(1 for points in scores.values() if points > 0),
+        }
+        return RankIndex(scores), stats
+    period_rank, period_stats = get_store().cached(
+        ("period_rank", start_date, end_date, department_filter), build_period_rank, LEDGER_TABLES
+    )
     
-    for user in st.session_state.users:
-        if user["role"] == "user":
-            # Apply department filter
-            if department_filter != "All Departments" and user["department"] != department_filter:
-                continue
-            
-            # Calculate points for time period
-            period_points = 0
-            for point in st.session_state.points_ledger:
-                if (point["user_id"] == user["id"] and 
-                    point["status"] == "approved" and 
-                    start_date <= point["date"] <= end_date):
-                    period_points += point["points"]
-            
-            # Get total points (all time)
-            total_points = get_user_total_points(user["id"])
-            level = get_user_level(total_points)
-            
-            # Get category breakdown for period
-            category_points = {}
-            for point in st.session_state.points_ledger:
-                if (point["user_id"] == user["id"] and 
-                    point["status"] == "approved" and 
-                    start_date <= point["date"] <= end_date):
-                    cat = point["category"]
-                    category_points[cat] = category_points.get(cat, 0) + point["points"]
-            
-            leaderboard_data.append({
-                "user_id": user["id"],
+    def build_entries(ranked: List[Tuple[int, int, int]]) -> List[Dict]:
+        """Leaderboard rows for a ranked slice - only these rows are looked up and formatted"""
+        user_ids = [user_id for _, user_id, _ in ranked]
+        balances = get_user_balances(user_ids)
+        breakdown = {}
+        if show_stats and user_ids:
+            if time_period == "All Time":
+                breakdown = get_all_points_by_category(user_ids)
+            else:
+                breakdown = get_period_points_by_category(start_date, end_date, user_ids)
+        
+        level_ids = get_level_ids([balances.get(user_id, 0) for user_id in user_ids])
+        
+        entries = []
+        for (rank, user_id, period_points), level_id in zip(ranked, level_ids):
+            user = users_by_id[user_id]
+            total_points = balances.get(user_id, 0)
+            entries.append({
+                "rank": rank,
+                "user_id": user_id,
                 "name": user["name"],
                 "department": user["department"],
                 "title": user.get("title", ""),
                 "period_points": period_points,
                 "total_points": total_points,
-                "level": level,
-                "category_breakdown": category_points
+                "level": LEVELS[level_id - 1],
+                "category_breakdown": breakdown.get(user_id, {})
             })
+        return entries
     
-    # Sort by period points
-    leaderboard_data.sort(key=lambda x: x["period_points"], reverse=True)
-    
-    # Assign ranks
-    for i, entry in enumerate(leaderboard_data, 1):
-        entry["rank"] = i
+    podium_data = build_entries(period_rank.top(3))
     
     # Display top 3 podium
-    if len(leaderboard_data) >= 3 and leaderboard_data[0]["period_points"] > 0:
+    if len(podium_data) >= 3 and podium_data[0]["period_points"] > 0:
         st.markdown(f"### 🏆 Top 3 Champions - {period_label}")
         
-        cols = st.columns([1, 2, 1])
-        
-        # 2nd Place
-        with cols[0]:
-            second = leaderboard_data[1]
-            st.markdown(f"""
-                <div style="background: linear-gradient(135deg, #c0c0c0 0%, #a8a8a8 100%);
-                            border-radius: 20px; padding: 30px; text-align: center;
-                            margin-top: 40px; border: 3px solid #e0e0e0;
-                            box-shadow: 0 8px 24px rgba(0,0,0,0.2);">
-                    <div style="font-size: 60px; margin-bottom: 12px;">🥈</div>
-                    <div style="font-size: 20px; font-weight: 800; color: white; margin-bottom: 8px;">
-                        {second['name']}
-                    </div>
-                    <div style="font-size: 14px; color: rgba(255,255,255,0.9); margin-bottom: 12px;">
-                        {second['title'] if second['title'] else second['department']}
-                    </div>
-                    <div style="font-size: 32px; font-weight: 800; color: white;">
-                        {second['period_points']:,}
-                    </div>
-                    <div style="font-size: 14px; color: rgba(255,255,255,0.9);">points</div>
-                </div>
-            """, unsafe_allow_html=True)
-        
-        # 1st Place
-        with cols[1]:
-            first = leaderboard_data[0]
-            st.markdown(f"""
-                <div style="background: linear-gradient(135deg, #ffd700 0%, #ffed4e 100%);
-                            border-radius: 24px; padding: 40px; text-align: center;
-                            border: 4px solid #ffed4e; margin-top: 0px;
-                            box-shadow: 0 12px 32px rgba(255, 215, 0, 0.4);
-                            animation: pulse 2s infinite;">
-                    <div style="font-size: 80px; margin-bottom: 16px;">👑</div>
-                    <div style="font-size: 24px; font-weight: 800; color: #1e293b; margin-bottom: 8px;">
-                        {first['name']}
-                    </div>
-                    <div style="font-size: 16px; color: #64748b; margin-bottom: 16px;">
-                        {first['title'] if first['title'] else first['department']}
-                    </div>
-                    <div style="font-size: 48px; font-weight: 800; color: #1e293b;">
-                        {first['period_points']:,}
-                    </div>
-                    <div style="font-size: 16px; color: #64748b; margin-bottom: 16px;">points</div>
-                    <div style="font-size: 14px; padding: 8px 16px; background: rgba(30, 41, 59, 0.1);
-                                border-radius: 8px; display: inline-block;">
-                        {first['level']['icon']} {first['level']['name']} Level
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
-        
-        # 3rd Place
-        with cols[2]:
-            third = leaderboard_data[2]
-            st.markdown(f"""
-                <div style="background: linear-gradient(135deg, #cd7f32 0%, #b87333 100%);
-                            border-radius: 20px; padding: 30px; text-align: center;
-                            margin-top: 40px; border: 3px solid #d4a574;
-                            box-shadow: 0 8px 24px rgba(0,0,0,0.2);">
-                    <div style="font-size: 60px; margin-bottom: 12px;">🥉</div>
-                    <div style="font-size: 20px; font-weight: 800; color: white; margin-bottom: 8px;">
-                        {third['name']}
-                    </div>
-                    <div style="font-size: 14px; color: rgba(255,255,255,0.9); margin-bottom: 12px;">
-                        {third['title'] if third['title'] else third['department']}
-                    </div>
-                    <div style="font-size: 32px; font-weight: 800; color: white;">
-                        {third['period_points']:,}
-                    </div>
-                    <div style="font-size: 14px; color: rgba(255,255,255,0.9);">points</div>
-                </div>
-            """, unsafe_allow_html=True)
+        # 2nd, 1st, 3rd from left to right
+        render_card_grid("podium", [
+            {**entry, "place": place, "medal": medal,
+             "subtitle": entry["title"] or entry["department"],
+             "level_icon": entry["level"]["icon"], "level_name": entry["level"]["name"]}
+            for entry, place, medal in [(podium_data[1], "second", "🥈"),
+                                        (podium_data[0], "first", "👑"),
+                                        (podium_data[2], "third", "🥉")]
+        ], columns="1fr 2fr 1fr")
     
     st.markdown("<br>", unsafe_allow_html=True)
     
-    # Full leaderboard table
+    # Ranked table - one page at a time, straight from the ranking index
     st.markdown(f"### 📊 Complete Rankings - {period_label}")
     
     if department_filter != "All Departments":
         st.info(f"Showing results for: **{department_filter}** department")
     
-    if leaderboard_data:
+    viewer_id = st.session_state.current_user_id
+    viewer_rank = period_rank.rank(viewer_id) if viewer_id in period_rank else None
+    
+    if len(period_rank):
+        start_rank, page_size = render_rank_pager(len(period_rank), viewer_rank, key="leaderboard")
+        page_data = build_entries(period_rank.top(page_size, start_rank))
+        
         # Prepare dataframe
         leaderboard_display = []
-        for entry in leaderboard_data:
+        for entry in page_data:
             display_entry = {
                 "🏅 Rank": entry["rank"],
                 "👤 Name": entry["name"],
@@ -2457,20 +4345,16 @@ def render_leaderboards_page():
             
             leaderboard_display.append(display_entry)
         
-        df_leaderboard = pd.DataFrame(leaderboard_display)
-        
-        # Highlight current user
-        current_user = next(u for u in st.session_state.users if u["id"] == st.session_state.current_user_id)
-        
         st.dataframe(
-            df_leaderboard,
+            pd.DataFrame(leaderboard_display),
             use_container_width=True,
             hide_index=True,
-            height=600
+            height=min(600, 38 + 35 * len(leaderboard_display))
         )
+        st.caption(f"Ranks {start_rank:,}-{start_rank + len(page_data) - 1:,} of {len(period_rank):,}")
         
-        # Show current user's position
-        user_entry = next((e for e in leaderboard_data if e["user_id"] == st.session_state.current_user_id), None)
+        # Show current user's position (rank and gap come from the ranking index)
+        user_entry = build_entries([(viewer_rank, viewer_id, period_rank.score(viewer_id))])[0] if viewer_rank else None
         
         if user_entry and user_entry["period_points"] > 0:
             st.markdown("---")
@@ -2483,8 +4367,8 @@ def render_leaderboards_page():
                 st.metric(f"Your Points ({period_label})", f"{user_entry['period_points']:,}", help="Points earned in this period")
             
             with col3:
-                if user_entry["rank"] > 1:
-                    gap = leaderboard_data[user_entry["rank"]-2]["period_points"] - user_entry["period_points"]
+                gap = period_rank.gap_to_next(user_entry["user_id"])
+                if gap is not None:
                     st.metric("Points to Next Rank", f"{gap:,}", help="Points needed to move up one position")
                 else:
                     st.metric("Status", "🏆 #1", help="You're at the top!")
@@ -2500,16 +4384,16 @@ def render_leaderboards_page():
         st.info("No data available for the selected time period and filters")
     
     # Statistics section
-    if show_stats and leaderboard_data:
+    if show_stats and len(period_rank):
         st.markdown("---")
         st.markdown(f"### 📈 Period Statistics - {period_label}")
         
         col1, col2, col3, col4 = st.columns(4)
         
-        total_points_period = sum(e["period_points"] for e in leaderboard_data)
-        avg_points = total_points_period / len(leaderboard_data) if leaderboard_data else 0
-        max_points = max([e["period_points"] for e in leaderboard_data], default=0)
-        active_users = len([e for e in leaderboard_data if e["period_points"] > 0])
+        total_points_period = period_stats["total"]
+        avg_points = total_points_period / len(period_rank)
+        max_points = period_stats["max"]
+        active_users = period_stats["active"]
         
         with col1:
             st.metric("Total Points Awarded", f"{total_points_period:,}")
@@ -2521,7 +4405,63 @@ def render_leaderboards_page():
             st.metric("Highest Score", f"{max_points:,}")
         
         with col4:
-            st.metric("Active Employees", f"{active_users}/{len(leaderboard_data)}")
+            st.metric("Active Employees", f"{active_users}/{len(period_rank)}")
+
+def render_rank_pager(total: int, viewer_rank: Optional[int], key: str,
+                      page_sizes: List[int] = LEADERBOARD_PAGE_SIZES) -> Tuple[int, int]:
+    """Render page controls for a ranked list and return (start_rank, page_size)"""
+    size_key, page_key = f"{key}_page_size", f"{key}_page"
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        page_size = st.selectbox("Rows per page", page_sizes, key=size_key)
+    
+    pages = max(1, -(-total // page_size))
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    
+    with col2:
+        page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key=page_key)
+    
+    with col3:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if viewer_rank is not None:
+            st.button(
+                "📍 Jump to My Rank", key=f"{key}_jump", use_container_width=True,
+                on_click=lambda: st.session_state.update({page_key: (viewer_rank - 1) // page_size + 1})
+            )
+    
+    return (int(page) - 1) * page_size + 1, page_size
+
+@st.fragment
+def render_notifications_panel(user_id: int):
+    """Render the sidebar notifications (marking them read reruns only this panel)"""
+    inbox = get_inbox(user_id)
+    unread_count = inbox["total_unread"]
+    
+    if unread_count:
+        st.markdown(f"""
+            <div style="background: rgba(239, 68, 68, 0.2); border: 1px solid #ef4444; 
+                        border-radius: 8px; padding: 12px; margin-bottom: 12px;">
+                <div style="font-size: 14px; font-weight: 600; color: white;">
+                    {unread_count} New Notifications
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
+        
+        for notif in get_unread_notifications(user_id, 3, inbox):
+            st.markdown(f"""
+                <div style="background: rgba(30, 41, 59, 0.6); border-radius: 8px; 
+                            padding: 12px; margin-bottom: 8px; font-size: 12px; color: #94a3b8;">
+                    {notif['message']}
+                </div>
+            """, unsafe_allow_html=True)
+        
+        st.button("Mark All Read", use_container_width=True,
+                  on_click=mark_all_notifications_read, args=(user_id,))
+    else:
+        st.info("No new notifications")
+
 
 # ==============================================================================
 # SECTION 9: MAIN APPLICATION
@@ -2530,6 +4470,9 @@ def render_leaderboards_page():
 def main():
     """Main application logic with navigation"""
     load_css()
+    # Started with the app, not on the first notification, so outbox rows left
+    # pending or awaiting retry by a previous process are resumed after a restart
+    get_delivery_worker()
     
     # Sidebar navigation
     with st.sidebar:
@@ -2543,10 +4486,10 @@ def main():
         
         # User switcher (for demo purposes)
         st.markdown("### 👤 Switch User")
-        user_options = {f"{u['name']} ({u['role'].upper()})": u['id'] for u in st.session_state.users}
+        user_options = {f"{u['name']} ({u['role'].upper()})": u['id'] for u in get_users()}
         
-        current_user_name = next(u['name'] for u in st.session_state.users if u["id"] == st.session_state.current_user_id)
-        current_display = f"{current_user_name} ({next(u['role'].upper() for u in st.session_state.users if u['id'] == st.session_state.current_user_id)})"
+        current_user = get_user(st.session_state.current_user_id)
+        current_display = f"{current_user['name']} ({current_user['role'].upper()})"
         
         selected_user = st.selectbox(
             "Select User",
@@ -2562,7 +4505,7 @@ def main():
         st.markdown("---")
         
         # Get current user
-        current_user = next(u for u in st.session_state.users if u["id"] == st.session_state.current_user_id)
+        current_user = get_user(st.session_state.current_user_id)
         
         # Format display with title if exists
         user_title = current_user.get('title', '')
@@ -2599,42 +4542,16 @@ def main():
         # Notifications panel
         st.markdown("---")
         st.markdown("### 🔔 Notifications")
-        user_notifications = [n for n in st.session_state.notifications 
-                            if n["user_id"] == st.session_state.current_user_id and not n["read"]]
-        
-        if user_notifications:
-            st.markdown(f"""
-                <div style="background: rgba(239, 68, 68, 0.2); border: 1px solid #ef4444; 
-                            border-radius: 8px; padding: 12px; margin-bottom: 12px;">
-                    <div style="font-size: 14px; font-weight: 600; color: white;">
-                        {len(user_notifications)} New Notifications
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
-            
-            for notif in user_notifications[:3]:
-                st.markdown(f"""
-                    <div style="background: rgba(30, 41, 59, 0.6); border-radius: 8px; 
-                                padding: 12px; margin-bottom: 8px; font-size: 12px; color: #94a3b8;">
-                        {notif['message']}
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            if st.button("Mark All Read", use_container_width=True):
-                for notif in user_notifications:
-                    notif["read"] = True
-                st.rerun()
-        else:
-            st.info("No new notifications")
+        render_notifications_panel(st.session_state.current_user_id)
         
         # Quick stats
         if current_user["role"] == "user":
             st.markdown("---")
             st.markdown("### 📊 Quick Stats")
-            total_points = get_user_total_points(st.session_state.current_user_id)
-            level = get_user_level(total_points)
+            view = get_user_view_model(st.session_state.current_user_id)
+            level = view["level"]
             
-            st.metric("Total Points", f"{total_points:,}")
+            st.metric("Total Points", f"{view['total_points']:,}")
             st.metric("Current Level", f"{level['icon']} {level['name']}")
     
     # Main content area - route to appropriate page